@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.models import Group, User
+from django.db import transaction
 
 from core_rndvu.models import *
+from core_rndvu.utils.entitlement_utils import set_entitlement
 
 # Скрываем стандартные модели Django auth из админки
 for model in (Group, User):
@@ -102,9 +104,15 @@ class SubscriptionGrantAdmin(admin.ModelAdmin):
     def _reset_subscription(self, player_ids):
         Player.objects.filter(id__in=player_ids).update(
             paid_subscription=False,
-            count_days_paid_subscription=0,
             subscription_end_date=None,
         )
+        tg_ids = list(Player.objects.filter(id__in=player_ids).values_list("tg_id", flat=True))
+
+        def drop_entitlements():
+            for tg_id in tg_ids:
+                set_entitlement(tg_id, None)
+
+        transaction.on_commit(drop_entitlements)
 
     def save_model(self, request, obj, form, change):
         if not change and not obj.applied_by:
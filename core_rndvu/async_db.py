@@ -0,0 +1,182 @@
+"""
+Нативный async-доступ к Postgres для горячих чтений (текущий игрок, лента, мэтчи) — settings.ASYNC_DB_ENABLED.
+
+Асинхронные методы ORM (aget, aiterator, acount) — это синхронный ORM в потоке sync_to_async: на каждый запрос
+переключение в поток, а одновременных запросов не больше, чем потоков. Здесь тот же QuerySet компилируется
+Django (SQL, параметры, конвертеры полей — всё как у ORM), но выполняется через psycopg3 AsyncConnection из
+общего async-пула прямо в event loop, а строки собираются в модели так же, как это делает ModelIterable.
+Результат эквивалентен ORM; при выключенной настройке функции просто вызывают ORM.
+
+Ограничения: только чтение вне transaction.atomic (пул не видит незакоммиченное в соединении ORM);
+prefetch_related поддерживается для обратных FK (profile__photos и т.п.) через Prefetch с queryset.
+"""
+import asyncio
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet, ObjectDoesNotExist
+from django.db import connections
+from django.db.models import F, Prefetch
+from django.db.models.query import get_related_populators
+from psycopg import AsyncClientCursor
+from psycopg_pool import AsyncConnectionPool
+
+from core_rndvu.instrumentation import record_query
+
+
+# Пулы привязаны к event loop (как и HTTP-клиент ЮKassa): под uvicorn это один пул на алиас БД
+_pools = {}
+
+
+def _connection_kwargs(alias: str) -> dict:
+    """Параметры подключения те же, что у ORM (адаптеры/часовой пояс Django), но с async-курсором"""
+    kwargs = connections[alias].get_connection_params()
+    kwargs["cursor_factory"] = AsyncClientCursor
+    kwargs["autocommit"] = True
+    return kwargs
+
+
+async def _configure(conn):
+    # Как DatabaseWrapper.ensure_timezone: сессия в часовом поясе соединения Django
+    await conn.execute("SELECT set_config('TimeZone', %s, false)", [connections["default"].timezone_name])
+
+
+def get_pool(alias: str = "default") -> AsyncConnectionPool:
+    """Async-пул соединений для алиаса БД в текущем event loop"""
+    loop = asyncio.get_running_loop()
+    pool = _pools.get((loop, alias))
+    if pool is None or pool.closed:
+        for key in [key for key in _pools if key[0] is not loop and key[0].is_closed()]:
+            del _pools[key]
+        pool = _pools[(loop, alias)] = AsyncConnectionPool(
+            kwargs=_connection_kwargs(alias),
+            configure=_configure,
+            check=AsyncConnectionPool.check_connection,
+            min_size=settings.ASYNC_DB_POOL_MIN_SIZE,
+            max_size=settings.ASYNC_DB_POOL_MAX_SIZE,
+            timeout=settings.ASYNC_DB_POOL_TIMEOUT,
+            open=False,
+        )
+    return pool
+
+
+def pool_stats() -> dict:
+    """Статистика async-пулов по алиасам БД (для метрик db_pool_*)"""
+    return {alias: pool.get_stats() for (_, alias), pool in _pools.items() if not pool.closed}
+
+
+async def _execute(alias: str, sql: str, params) -> list:
+    pool = get_pool(alias)
+    await pool.open()
+    async with pool.connection() as conn, conn.cursor() as cursor:
+        started = time.perf_counter()
+        await cursor.execute(sql, params)
+        rows = await cursor.fetchall()
+        record_query(time.perf_counter() - started, sql)
+        return rows
+
+
+def _populate(queryset, compiler, rows) -> list:
+    """Модели из строк — повторяет ModelIterable (select_related, аннотации, конвертеры полей)"""
+    db = queryset.db
+    select, klass_info, annotation_col_map = compiler.select, compiler.klass_info, compiler.annotation_col_map
+    model_cls = klass_info["model"]
+    select_fields = klass_info["select_fields"]
+    model_fields_start, model_fields_end = select_fields[0], select_fields[-1] + 1
+    init_list = [f[0].target.attname for f in select[model_fields_start:model_fields_end]]
+    related_populators = get_related_populators(klass_info, select, db)
+    objs = []
+    for row in compiler.results_iter([rows]):
+        obj = model_cls.from_db(db, init_list, row[model_fields_start:model_fields_end])
+        for rel_populator in related_populators:
+            rel_populator.populate(row, obj)
+        for attr_name, col_pos in annotation_col_map.items():
+            setattr(obj, attr_name, row[col_pos])
+        objs.append(obj)
+    return objs
+
+
+def _owners(objs, path: list) -> list:
+    """Объекты в конце цепочки select_related (пропуская отсутствующие связи)"""
+    for attr in path:
+        next_objs = []
+        for obj in objs:
+            try:
+                related = getattr(obj, attr)
+            except ObjectDoesNotExist:
+                continue
+            if related is not None:
+                next_objs.append(related)
+        objs = next_objs
+    return list({id(obj): obj for obj in objs}.values())
+
+
+async def _prefetch(objs, lookup):
+    """Обратный FK по цепочке select_related: один запрос на lookup, результат кладём в кэш prefetch"""
+    if not isinstance(lookup, Prefetch):
+        lookup = Prefetch(lookup)
+    *path, related_name = lookup.prefetch_through.split("__")
+    owners = _owners(objs, path)
+    if not owners:
+        return
+    manager = getattr(owners[0], related_name)
+    field = manager.field
+    queryset = lookup.queryset if lookup.queryset is not None else manager.model._default_manager.all()
+    # Владельца берём отдельной колонкой: в queryset с only() поле FK может быть отложенным
+    related = await afetch(queryset.filter(**{f"{field.name}__in": [owner.pk for owner in owners]})
+                           .annotate(_prefetch_owner=F(field.attname)))
+    grouped = defaultdict(list)
+    for obj in related:
+        grouped[obj._prefetch_owner].append(obj)
+    for owner in owners:
+        values = grouped.get(owner.pk, [])
+        for value in values:
+            field.set_cached_value(value, owner)
+        if lookup.to_attr:
+            setattr(owner, lookup.to_attr, values)
+        else:
+            qs = getattr(owner, related_name).get_queryset()
+            qs._result_cache = values
+            qs._prefetch_done = True
+            owner.__dict__.setdefault("_prefetched_objects_cache", {})[field.remote_field.cache_name] = qs
+
+
+async def afetch(queryset) -> list:
+    """Список моделей QuerySet (как list(qs)) через async-пул"""
+    if not settings.ASYNC_DB_ENABLED:
+        return [obj async for obj in queryset.aiterator()]
+    compiler = queryset.query.get_compiler(using=queryset.db)
+    try:
+        sql, params = compiler.as_sql()
+    except EmptyResultSet:
+        return []
+    objs = _populate(queryset, compiler, await _execute(queryset.db, sql, params))
+    for lookup in queryset._prefetch_related_lookups:
+        await _prefetch(objs, lookup)
+    return objs
+
+
+async def aget(queryset, **kwargs):
+    """Как QuerySet.aget(): DoesNotExist / MultipleObjectsReturned"""
+    if not settings.ASYNC_DB_ENABLED:
+        return await queryset.aget(**kwargs)
+    model = queryset.model
+    objs = await afetch(queryset.filter(**kwargs)[:2] if kwargs else queryset[:2])
+    if not objs:
+        raise model.DoesNotExist(f"{model._meta.object_name} matching query does not exist.")
+    if len(objs) > 1:
+        raise model.MultipleObjectsReturned(f"get() returned more than one {model._meta.object_name}")
+    return objs[0]
+
+
+async def acount(queryset) -> int:
+    """Как QuerySet.acount(): COUNT(*) поверх того же SQL (учитывает distinct и аннотации)"""
+    if not settings.ASYNC_DB_ENABLED:
+        return await queryset.acount()
+    try:
+        sql, params = queryset.order_by().query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    rows = await _execute(queryset.db, f"SELECT COUNT(*) FROM ({sql}) subquery", params)
+    return rows[0][0]
@@ -0,0 +1,68 @@
+"""
+Чтение с реплики (DATABASES["replica"]) для GET-ручек API с «прилипанием» к primary после своих записей.
+
+Алиас для чтения выбирает ReplicaRoutingMiddleware на время запроса и кладёт в ContextVar — sync_to_async
+копирует контекст в поток ORM, так что и aget/aiterator, и core_rndvu.async_db читают из выбранной БД.
+Вне запроса (Celery, админка, команды) и без настроенной реплики всё идёт в default.
+
+Реплика отстаёт от primary. Чтобы пользователь сразу видел свои изменения, после его записи (POST/PUT/PATCH/DELETE
+или применённой оплаты) в Redis на REPLICA_STICKY_SECONDS ставится метка — пока она есть, его GET идут в primary.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+REPLICA_DB_ALIAS = "replica"
+STICKY_KEY = "db:sticky:{}"
+
+_read_alias = ContextVar("read_alias", default=None)
+
+
+def replica_configured() -> bool:
+    return REPLICA_DB_ALIAS in connections.settings
+
+
+@contextmanager
+def use_database(alias: str):
+    """Все чтения внутри блока идут в alias"""
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def mark_sticky(tg_id):
+    """Игрок только что записал данные: его чтения какое-то время идут в primary"""
+    if tg_id:
+        cache.set(STICKY_KEY.format(tg_id), 1, timeout=settings.REPLICA_STICKY_SECONDS)
+
+
+async def amark_sticky(tg_id):
+    if tg_id:
+        await cache.aset(STICKY_KEY.format(tg_id), 1, timeout=settings.REPLICA_STICKY_SECONDS)
+
+
+async def ais_sticky(tg_id) -> bool:
+    return bool(tg_id) and await cache.aget(STICKY_KEY.format(tg_id)) is not None
+
+
+class ReplicaRouter:
+    """Чтения — в алиас, выбранный для текущего запроса; записи и миграции — только в default"""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика — копия default: объекты из обеих БД можно связывать
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,143 @@
+"""
+Быстрая сериализация для горячих ручек (лента игры, избранное, взаимные симпатии).
+
+ADRF ModelSerializer с SerializerMethodField на каждый объект заново собирает поля, гоняет
+валидаторы представления и вложенные сериализаторы. Здесь те же ответы собираются обычными
+функциями в dict — без экземпляров сериализаторов. Формат полностью совпадает с
+GameUserSerializer, PlayerFovariteSerializer и SympathySerializer (см. SnapshotTests в tests.py),
+поэтому при любом изменении этих сериализаторов нужно править и этот модуль.
+"""
+from rest_framework import serializers
+
+from core_rndvu.models import Player
+from core_rndvu.serializers import GENDER_CHOICES_DATA, calculate_age
+
+
+# Поля DRF используем только как форматтеры: так даты и ссылки на фото выглядят ровно как в сериализаторах
+_datetime_field = serializers.DateTimeField()
+_date_field = serializers.DateField()
+_image_field = serializers.ImageField()
+
+
+def _datetime(value):
+    return None if value is None else _datetime_field.to_representation(value)
+
+
+def _date(value):
+    return None if value is None else _date_field.to_representation(value)
+
+
+def _build_field_getters(model):
+    """Список (имя поля, атрибут, форматтер) в том же порядке, что и fields="__all__" у ModelSerializer"""
+    getters = []
+    for field in model._meta.fields:
+        if not field.serialize or field.remote_field:
+            continue
+        if field.get_internal_type() == "DateTimeField":
+            formatter = _datetime
+        elif field.get_internal_type() == "DateField":
+            formatter = _date
+        else:
+            formatter = None
+        getters.append((field.name, field.attname, formatter))
+    return getters
+
+
+_PLAYER_FIELD_GETTERS = _build_field_getters(Player)
+
+
+def _player_model_fields(player, data):
+    for name, attname, formatter in _PLAYER_FIELD_GETTERS:
+        value = getattr(player, attname)
+        data[name] = formatter(value) if formatter else value
+    return data
+
+
+def _profile_photos(player):
+    """Фото анкеты игрока из префетча (список) или None, если анкеты нет"""
+    if player.gender == "Woman" and hasattr(player, "woman_profile"):
+        return list(player.woman_profile.photos.all())
+    if player.gender == "Man" and hasattr(player, "man_profile"):
+        return list(player.man_profile.photos.all())
+    return None
+
+
+def _main_photo(photos_list):
+    if not photos_list:
+        return None
+    return next((p for p in photos_list if p.main_photo), None) or photos_list[0]
+
+
+def photo_data(photo):
+    """То же, что ManPhotoSerializer/WomanPhotoSerializer"""
+    return {
+        "id": photo.id,
+        "image": _image_field.to_representation(photo.image),
+        "uploaded_at": _datetime(photo.uploaded_at),
+        "main_photo": photo.main_photo,
+    }
+
+
+def player_data(player, omit_choices=False):
+    """То же, что PlayerSerializer"""
+    data = {"id": player.id}
+    if not omit_choices:
+        data["gender_choices"] = GENDER_CHOICES_DATA
+    data["like_ratio"] = float(player.like_ratio)
+    main = _main_photo(_profile_photos(player))
+    data["main_photo"] = photo_data(main) if main else None
+    data["count_days_paid_subscription"] = player.count_days_paid_subscription
+    return _player_model_fields(player, data)
+
+
+def favorite_player_data(player, omit_choices=False):
+    """То же, что PlayerFovariteSerializer"""
+    data = {"id": player.id}
+    if not omit_choices:
+        data["gender_choices"] = GENDER_CHOICES_DATA
+    data["like_ratio"] = float(player.like_ratio)
+    photos = _profile_photos(player)
+    data["photos"] = [photo_data(p) for p in photos] if photos is not None else []
+    if player.hide_age_in_profile:
+        data["birth_date"] = None
+    elif player.gender == "Woman" and hasattr(player, "woman_profile"):
+        data["birth_date"] = player.woman_profile.birth_date
+    elif player.gender == "Man" and hasattr(player, "man_profile"):
+        data["birth_date"] = player.man_profile.birth_date
+    else:
+        data["birth_date"] = None
+    data["count_days_paid_subscription"] = player.count_days_paid_subscription
+    return _player_model_fields(player, data)
+
+
+def game_user_data(player):
+    """То же, что GameUserSerializer (в ленте отдаём только главное фото)"""
+    if player.hide_age_in_profile:
+        age = None
+    else:
+        birth_date = getattr(player, "birth_date", None)
+        age = calculate_age(birth_date) if birth_date else None
+    main = _main_photo(_profile_photos(player))
+    return {
+        "id": player.id,
+        "tg_id": player.tg_id,
+        "first_name": player.first_name,
+        "username": player.username,
+        "gender": player.gender,
+        "city": player.city,
+        "is_active": player.is_active,
+        "age": age,
+        "photos": [photo_data(main)] if main else [],
+        "hide_age_in_profile": player.hide_age_in_profile,
+    }
+
+
+def sympathy_data(sympathy, omit_choices=False):
+    """То же, что SympathySerializer"""
+    return {
+        "id": sympathy.id,
+        "from_player": player_data(sympathy.from_player, omit_choices),
+        "to_player": player_data(sympathy.to_player, omit_choices),
+        "is_mutual": sympathy.is_mutual,
+        "created_at": _datetime(sympathy.created_at),
+    }
@@ -0,0 +1,206 @@
+"""
+Куда уходит время запроса API: общее время ручки, число запросов к БД и время в БД, время рендеринга ответа в JSON.
+Сборка данных сериализаторами (DRF и fast_serializers) идёт во вьюхе и входит только в общее время ручки.
+
+Статистика текущего запроса лежит в ContextVar (её заводит RequestMetricsMiddleware). sync_to_async копирует
+контекст в поток ORM, поэтому один execute_wrapper, навешенный на каждое соединение Django при подключении,
+видит статистику своего запроса — без привязки к потоку и без лишней работы вне запросов (Celery, команды).
+Запросы нативного async-драйвера (core_rndvu.async_db) учитываются там же через record_query().
+
+Для dev/staging (settings.QUERY_INSPECTOR_ENABLED) здесь же детектор N+1 и медленных запросов: одинаковые
+по форме запросы, повторённые за запрос QUERY_INSPECTOR_REPEAT_THRESHOLD раз и больше, и запросы дольше
+QUERY_INSPECTOR_SLOW_MS пишутся в лог с маршрутом, строкой кода проекта и полем сериализатора, откуда они пришли.
+Строку кода ищем в стеке потока ORM (синхронный код, сериализаторы), а если там только Django — в стеке
+ожидающей корутины запроса (await ...aget() во вьюхе). С QUERY_INSPECTOR_RAISE находки поднимают
+QueryInspectionError — тестовый клиент пробрасывает его, и тест падает.
+"""
+import asyncio
+import os
+import re
+import sys
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from core_rndvu.metrics import Histogram
+from logger_conf import logger
+
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Время обработки запроса API", labelnames=("route", "method", "status"),
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "Запросов к БД на запрос API", labelnames=("route", "method"),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds", "Время в БД на запрос API", labelnames=("route", "method"),
+)
+REQUEST_RENDER_DURATION = Histogram(
+    "http_request_render_duration_seconds",
+    "Время рендеринга ответа API в JSON (orjson.dumps), без сборки данных сериализаторами",
+    labelnames=("route", "method"),
+)
+
+
+# Списки плейсхолдеров (IN (%s, %s, ...), строки VALUES) любой длины — одна и та же форма запроса
+_PLACEHOLDER_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+_ROWS_LIST = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+_PROJECT_DIR = str(settings.BASE_DIR)
+# Обёртки над запросами — не «откуда» запрос, ищем вызвавший их код
+_SKIP_FILES = tuple(os.path.join("core_rndvu", name) for name in ("instrumentation.py", "async_db.py"))
+_ASGIREF_SYNC = os.path.join("asgiref", "sync.py")
+
+
+class QueryInspectionError(AssertionError):
+    """N+1 или медленный запрос при QUERY_INSPECTOR_RAISE"""
+
+
+class RequestStats:
+    """
+    Накопленное за один запрос: запросы к БД, время в БД и в рендеринге JSON (секунды).
+    С детектором — ещё задача asyncio запроса и формы запросов: форма -> [сколько раз, откуда, время].
+    """
+    __slots__ = ("queries", "db_time", "render_time", "task", "shapes", "slow")
+
+    def __init__(self, inspect=False):
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.task = None
+        self.shapes = {} if inspect else None
+        self.slow = []
+
+
+_request_stats = ContextVar("request_stats", default=None)
+
+
+def start_request() -> tuple:
+    """Новая статистика для текущего запроса; токен нужен для finish_request()"""
+    stats = RequestStats(inspect=settings.QUERY_INSPECTOR_ENABLED)
+    if stats.shapes is not None:
+        try:
+            stats.task = asyncio.current_task()
+        except RuntimeError:
+            pass
+    return stats, _request_stats.set(stats)
+
+
+def finish_request(token):
+    _request_stats.reset(token)
+
+
+def record_query(duration: float, sql: str = None):
+    stats = _request_stats.get()
+    if stats is None:
+        return
+    stats.queries += 1
+    stats.db_time += duration
+    if stats.shapes is None or sql is None:
+        return
+    shape = _ROWS_LIST.sub("(...), ...", _PLACEHOLDER_LIST.sub("(...)", sql))
+    seen = stats.shapes.get(shape)
+    if seen is None:
+        seen = stats.shapes[shape] = [0, None, 0.0]
+    seen[0] += 1
+    seen[2] += duration
+    # Стек разбираем только когда есть что показать: на первом повторе формы и для медленного запроса
+    slow = duration * 1000 >= settings.QUERY_INSPECTOR_SLOW_MS
+    if seen[0] == 2 or slow:
+        origin = _origin(stats)
+        if seen[0] == 2:
+            seen[1] = origin
+        if slow:
+            stats.slow.append((duration, sql, origin))
+
+
+def record_render(duration: float):
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.render_time += duration
+
+
+def _time_query(execute, sql, params, many, context):
+    """execute_wrapper: вне запроса API (статистики нет) — просто выполняем"""
+    if _request_stats.get() is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record_query(perf_counter() - started, sql)
+
+
+def _await_chain(awaitable) -> list:
+    frames = []
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None)
+        if frame is not None:
+            frames.append(frame)
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+    return frames
+
+
+def _origin(stats) -> str:
+    """Откуда запрос: ближайшая строка кода проекта и поле сериализатора, если запрос случился при сериализации"""
+    frames = []
+    frame = sys._getframe(2)
+    # Стек потока — до входа в sync_to_async: дальше чужой код (в тестах и runserver поток ORM — главный)
+    while frame is not None and not frame.f_code.co_filename.endswith(_ASGIREF_SYNC):
+        frames.append(frame)
+        frame = frame.f_back
+    if stats.task is not None and not stats.task.done():
+        # Цепочка await корутины запроса (Task.get_stack() у приостановленной задачи отдаёт только верхний кадр):
+        # идёт от внешней к текущей, нам нужно от ближайшей
+        frames.extend(reversed(_await_chain(stats.task.get_coro())))
+    location = field = None
+    for frame in frames:
+        code = frame.f_code
+        if field is None and code.co_name == "to_representation":
+            serializer_field = frame.f_locals.get("field")
+            if getattr(serializer_field, "field_name", None):
+                field = f"{type(frame.f_locals.get('self')).__name__}.{serializer_field.field_name}"
+        if (location is None and code.co_filename.startswith(_PROJECT_DIR)
+                and not code.co_filename.endswith(_SKIP_FILES) and "site-packages" not in code.co_filename):
+            path = os.path.relpath(code.co_filename, _PROJECT_DIR)
+            location = f"{path}:{frame.f_lineno} ({code.co_name})"
+    return ", ".join(part for part in (location or "вне кода проекта", field and f"поле {field}") if part)
+
+
+def inspect_request(stats: RequestStats, route: str):
+    """Находки детектора за запрос: в лог или QueryInspectionError при QUERY_INSPECTOR_RAISE"""
+    if stats.shapes is None:
+        return
+    problems = [
+        f"N+1: {count} одинаковых запросов ({duration * 1000:.1f}мс) из {origin}: {shape[:500]}"
+        for shape, (count, origin, duration) in stats.shapes.items()
+        if count >= settings.QUERY_INSPECTOR_REPEAT_THRESHOLD
+    ]
+    problems.extend(f"Медленный запрос {duration * 1000:.1f}мс из {origin}: {sql[:500]}"
+                    for duration, sql, origin in stats.slow)
+    if not problems:
+        return
+    if settings.QUERY_INSPECTOR_RAISE:
+        raise QueryInspectionError(f"[{route}] " + "\n".join(problems))
+    for problem in problems:
+        logger.warning(f"[{route}] {problem}")
+
+
+@receiver(connection_created)
+def _install_query_timer(sender, connection, **kwargs):
+    # Обёртки живут на DatabaseWrapper (по одному на поток и алиас), а connection_created шлётся
+    # на каждое переподключение — вешаем один раз
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+def observe_request(stats: RequestStats, route: str, method: str, status: int, duration: float):
+    REQUEST_DURATION.observe(duration, route=route, method=method, status=status)
+    REQUEST_DB_QUERIES.observe(stats.queries, route=route, method=method)
+    REQUEST_DB_DURATION.observe(stats.db_time, route=route, method=method)
+    REQUEST_RENDER_DURATION.observe(stats.render_time, route=route, method=method)
@@ -0,0 +1,105 @@
+"""
+Обслуживающие задачи Celery: пакетное удаление старых строк в обход ORM-коллектора.
+
+QuerySet.delete() сначала выбирает все строки (и связанные для каскада), держит их в памяти и шлёт сигналы.
+Здесь удаляем сырым DELETE ... WHERE ctid IN (SELECT ctid ... LIMIT n): каждая пачка — отдельная короткая
+транзакция, блокировки держатся миллисекунды, а общий бюджет времени не даёт задаче упереться в
+CELERY_TASK_TIME_LIMIT. Недоудалённое добирается при следующем запуске.
+
+Сигналы и каскады Django при этом не срабатывают — подходит только для таблиц, на которые никто не ссылается
+(или ссылается с ON DELETE CASCADE на уровне БД).
+
+Прогоны идут в воркере Celery, а /internal/metrics/ отдаёт веб-процесс: статистика последнего прогона каждой задачи
+лежит в Redis, метрики maintenance_last_run_* читают её при отдаче.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core_rndvu.metrics import CallbackMetric
+from logger_conf import logger
+
+
+MAINTENANCE_STATS_KEY = "maintenance:last_run:{}"
+# Задачи с пакетным удалением (core_rndvu/tasks.py): по ним отдаются метрики последнего прогона
+MAINTENANCE_JOBS = ("payment_events",)
+
+
+def delete_sql(model, where: str) -> str:
+    """DELETE одной пачки: ctid строк из подзапроса с LIMIT"""
+    table = connection.ops.quote_name(model._meta.db_table)
+    return f"DELETE FROM {table} WHERE ctid IN (SELECT ctid FROM {table} WHERE {where} LIMIT %s)"
+
+
+def batched_delete(job: str, model, where: str, params=(), *, batch_size=None, time_budget=None) -> dict:
+    """
+    Удаляем строки model, подходящие под where (SQL с %s-параметрами), пачками по batch_size,
+    пока не кончатся строки или бюджет времени (секунды). Возвращает и сохраняет статистику прогона.
+    """
+    batch_size = batch_size or settings.MAINTENANCE_BATCH_SIZE
+    time_budget = time_budget if time_budget is not None else settings.MAINTENANCE_TIME_BUDGET
+    sql = delete_sql(model, where)
+    started = time.monotonic()
+    deadline = started + time_budget
+    deleted = batches = 0
+    finished = False
+
+    while time.monotonic() < deadline:
+        # Каждая пачка коммитится сразу — блокировки не копятся на весь прогон
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, [*params, batch_size])
+            count = cursor.rowcount
+        deleted += count
+        batches += 1
+        if count < batch_size:
+            finished = True
+            break
+        # Пауза между пачками, чтобы не забивать WAL/реплики и дать поработать autovacuum
+        time.sleep(settings.MAINTENANCE_BATCH_PAUSE)
+
+    stats = {
+        "job": job,
+        "deleted": deleted,
+        "batches": batches,
+        "duration": round(time.monotonic() - started, 3),
+        "finished": finished,
+        "finished_at": timezone.now().isoformat(),
+    }
+    record_run(stats)
+    return stats
+
+
+def record_run(stats: dict):
+    """Пишем статистику прогона в лог и в Redis (последний прогон каждой задачи)"""
+    cache.set(MAINTENANCE_STATS_KEY.format(stats["job"]), stats, timeout=None)
+    level = logger.info if stats["finished"] else logger.warning
+    level(f"Обслуживание {stats['job']}: удалено {stats['deleted']} строк за {stats['batches']} пачек, "
+          f"{stats['duration']}с" + ("" if stats["finished"] else " — бюджет времени исчерпан, остаток в следующий раз"))
+
+
+def get_last_runs(*jobs: str) -> dict:
+    """Статистика последних прогонов по именам задач"""
+    stats = cache.get_many([MAINTENANCE_STATS_KEY.format(job) for job in jobs])
+    return {job: stats.get(MAINTENANCE_STATS_KEY.format(job)) for job in jobs}
+
+
+
+def _last_run(field: str):
+    """Поле статистики последнего прогона по задачам, которые уже запускались"""
+    def collect():
+        return {(job,): float(stats[field]) for job, stats in get_last_runs(*MAINTENANCE_JOBS).items() if stats}
+    return collect
+
+
+MAINTENANCE_DELETED = CallbackMetric("maintenance_last_run_deleted_rows", "Удалено строк за последний прогон",
+                                     _last_run("deleted"), labelnames=("job",))
+MAINTENANCE_BATCHES = CallbackMetric("maintenance_last_run_batches", "Пачек DELETE за последний прогон",
+                                     _last_run("batches"), labelnames=("job",))
+MAINTENANCE_DURATION = CallbackMetric("maintenance_last_run_duration_seconds", "Длительность последнего прогона",
+                                      _last_run("duration"), labelnames=("job",))
+MAINTENANCE_FINISHED = CallbackMetric("maintenance_last_run_finished",
+                                      "1 — последний прогон удалил всё, 0 — упёрся в бюджет времени",
+                                      _last_run("finished"), labelnames=("job",))
@@ -0,0 +1,114 @@
+import asyncio
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef, Prefetch
+from django.test.utils import override_settings
+
+from core_rndvu import async_db
+from core_rndvu.models import ManPhoto, Match, Player, WomanPhoto
+from core_rndvu.views import PHOTO_FIELDS, matches_with_sympathy
+
+
+class Command(BaseCommand):
+    help = ("Сравнение ORM (sync_to_async) и нативного async-драйвера на горячих чтениях под конкурентной нагрузкой: "
+            "текущий игрок, страница ленты, список мэтчей. Перед замером проверяет, что результаты совпадают.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tg-id", type=int,
+                            help="Игрок, от лица которого идут запросы (по умолчанию — первый с указанным полом).")
+        parser.add_argument("--requests", type=int, default=500, help="Сколько запросов каждого вида.")
+        parser.add_argument("--concurrency", type=int, default=50, help="Сколько запросов одновременно.")
+
+    def handle(self, *args, **options):
+        asyncio.run(self._run(options))
+
+    async def _run(self, options):
+        player = await self._player(options["tg_id"])
+        paths = {
+            "текущий игрок": lambda: async_db.aget(Player.objects, tg_id=player.tg_id),
+            "лента (count + страница)": lambda: self._feed(player),
+            "мэтчи": lambda: async_db.afetch(
+                matches_with_sympathy(Match.objects.filter(player=player)).order_by("-created_at")),
+        }
+        for name, call in paths.items():
+            orm, native = await self._measure(call, False, 1, 1), await self._measure(call, True, 1, 1)
+            if self._key(orm[1]) != self._key(native[1]):
+                raise CommandError(f"{name}: результаты ORM и async-драйвера различаются")
+            orm_stats = await self._measure(call, False, options["requests"], options["concurrency"])
+            native_stats = await self._measure(call, True, options["requests"], options["concurrency"])
+            self.stdout.write(f"{name}: ORM {self._format(orm_stats[0])} | async {self._format(native_stats[0])} | "
+                              f"ускорение x{orm_stats[0]['elapsed'] / native_stats[0]['elapsed']:.1f}")
+
+    @staticmethod
+    async def _player(tg_id):
+        qs = Player.objects.exclude(gender__isnull=True)
+        try:
+            return await (qs.aget(tg_id=tg_id) if tg_id else qs.order_by("id")[:1].aget())
+        except Player.DoesNotExist:
+            raise CommandError("Нет игрока для замера (сгенерируйте данные командой generate_test_players)")
+
+    @staticmethod
+    async def _feed(player):
+        """Запрос ленты как в GameUsersView, но с детерминированной сортировкой для сравнения результатов"""
+        is_man = player.gender == "Man"
+        profile = "woman_profile" if is_man else "man_profile"
+        photo_model = WomanPhoto if is_man else ManPhoto
+        photos = photo_model.objects.only(*PHOTO_FIELDS)
+        qs = (
+            Player.objects.filter(gender="Woman" if is_man else "Man", is_active=True, show_in_game=True)
+            .exclude(id=player.id)
+            .filter(Exists(photo_model.objects.filter(profile=OuterRef(profile))))
+            .select_related(profile)
+            .prefetch_related(Prefetch(f"{profile}__photos", queryset=photos))
+            .order_by("-registration_date", "id")
+        )
+        return await async_db.acount(qs), await async_db.afetch(qs[:10])
+
+    @staticmethod
+    def _key(result):
+        """Сравнимое представление результата: pk моделей и pk их фото"""
+        if isinstance(result, tuple):
+            return tuple(Command._key(item) for item in result)
+        if isinstance(result, list):
+            return [Command._key(item) for item in result]
+        if isinstance(result, Match):
+            sympathy = result.sympathy
+            return result.pk, Command._key(sympathy.from_player), Command._key(sympathy.to_player)
+        if isinstance(result, Player):
+            # Только то, что загружено select_related: без обращения к БД
+            cache = result._state.fields_cache
+            profile = cache.get("man_profile") or cache.get("woman_profile")
+            photos = sorted(p.pk for p in profile.photos.all()) if profile else []
+            return result.pk, result.tg_id, photos
+        return result
+
+    @staticmethod
+    async def _measure(call, native, requests, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        result = None
+
+        async def one():
+            nonlocal result
+            async with semaphore:
+                started = time.perf_counter()
+                result = await call()
+                latencies.append(time.perf_counter() - started)
+
+        with override_settings(ASYNC_DB_ENABLED=native):
+            started = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(requests)))
+            elapsed = time.perf_counter() - started
+        latencies.sort()
+        return {
+            "elapsed": elapsed,
+            "rps": requests / elapsed,
+            "p50": statistics.median(latencies),
+            "p95": latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0],
+        }, result
+
+    @staticmethod
+    def _format(stats):
+        return f"{stats['rps']:.0f} запр/с, p50 {stats['p50'] * 1000:.1f}мс, p95 {stats['p95'] * 1000:.1f}мс"
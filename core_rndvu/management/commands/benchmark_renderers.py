@@ -0,0 +1,75 @@
+import random
+import timeit
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from core_rndvu.renderers import ORJSONRenderer
+from core_rndvu.serializers import GENDER_CHOICES_DATA
+
+
+class Command(BaseCommand):
+    help = "Сравнение скорости JSONRenderer (stdlib json) и ORJSONRenderer на полной странице ленты и избранного."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=2000, help="Сколько раз рендерить каждый ответ.")
+        parser.add_argument("--page-size", type=int, default=10, help="Размер страницы ленты (как в GameUsersView).")
+        parser.add_argument("--favorites", type=int, default=200, help="Сколько записей в списке избранного.")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options["seed"])
+        payloads = {
+            f"game/users (страница {options['page_size']})": self._feed_page(rnd, options["page_size"]),
+            f"favorites ({options['favorites']} записей)": self._favorites(rnd, options["favorites"]),
+        }
+        iterations = options["iterations"]
+        for name, payload in payloads.items():
+            json_bytes = JSONRenderer().render(payload)
+            orjson_bytes = ORJSONRenderer().render(payload)
+            json_time = timeit.timeit(lambda: JSONRenderer().render(payload), number=iterations)
+            orjson_time = timeit.timeit(lambda: ORJSONRenderer().render(payload), number=iterations)
+            self.stdout.write(
+                f"{name}: {len(json_bytes) / 1024:.1f}KB, "
+                f"json {json_time / iterations * 1e6:.1f}мкс, orjson {orjson_time / iterations * 1e6:.1f}мкс, "
+                f"ускорение x{json_time / orjson_time:.1f}, одинаковый вывод: {json_bytes == orjson_bytes}"
+            )
+
+    @staticmethod
+    def _photo(rnd, photo_id, is_main):
+        uploaded = datetime(2025, 1, 1, tzinfo=dt_timezone.utc) + timedelta(minutes=rnd.randint(0, 500000))
+        return {"id": photo_id, "image": f"https://cdn.example.com/media/women_photos/{photo_id}.jpg",
+                "uploaded_at": uploaded.isoformat(), "main_photo": is_main}
+
+    def _feed_page(self, rnd, page_size):
+        """Ответ GameUsersView: карточки с главным фото и пагинация"""
+        results = [{
+            "id": i, "tg_id": 7_000_000_000 + i, "first_name": f"Имя {i}", "username": f"user_{i}",
+            "gender": "Woman", "city": rnd.choice([524901, 498817, 551487]), "is_active": True,
+            "age": rnd.randint(18, 45), "photos": [self._photo(rnd, i * 10, True)], "hide_age_in_profile": False,
+        } for i in range(page_size)]
+        return {"results": results, "page": 1, "page_size": page_size, "total_count": 1000, "total_pages": 100,
+                "has_prev": False, "has_next": True, "prev_page": None, "next_page": 2, "premium": False}
+
+    def _favorites(self, rnd, count):
+        """Ответ FavoriteView.get: полные карточки со всеми фото, created_at — сырой datetime"""
+        results = []
+        for i in range(count):
+            results.append({
+                "id": i,
+                "created_at": datetime(2025, 3, 1, tzinfo=dt_timezone.utc) + timedelta(seconds=rnd.randint(0, 10**7)),
+                "target": {
+                    "id": i, "gender_choices": GENDER_CHOICES_DATA, "like_ratio": rnd.random() * 100,
+                    "photos": [self._photo(rnd, i * 10 + j, j == 0) for j in range(rnd.randint(1, 6))],
+                    "birth_date": date(1990, 1, 1) + timedelta(days=rnd.randint(0, 8000)),
+                    "tg_id": 7_000_000_000 + i, "first_name": f"Имя {i}", "username": f"user_{i}",
+                    "language_code": "ru", "gender": "Woman", "city": 524901, "alpha2": "RU",
+                    "registration_date": "2025-01-02T03:04:05.123456+03:00", "hide_age_in_profile": False,
+                    "is_active": True, "show_in_game": True, "likes_count": rnd.randint(0, 500),
+                    "dislikes_count": rnd.randint(0, 100), "paid_subscription": False,
+                    "count_days_paid_subscription": None, "subscription_end_date": None, "verification": False,
+                    "link_tg": f"https://t.me/{7_000_000_000 + i}",
+                },
+            })
+        return {"results": results, "count": count}
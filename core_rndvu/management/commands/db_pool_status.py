@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core_rndvu.utils.db_pool_utils import check_database, pool_stats
+
+
+class Command(BaseCommand):
+    help = "Проверка соединения с БД (SELECT 1) и состояние пула соединений; код выхода 1, если БД недоступна."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default", help="Алиас БД из settings.DATABASES.")
+
+    def handle(self, *args, **options):
+        alias = options["database"]
+        if alias not in connections:
+            raise CommandError(f"Неизвестный алиас БД: {alias}")
+        try:
+            latency = check_database(alias)
+        except Exception as e:
+            raise CommandError(f"БД {alias} недоступна: {e}")
+        self.stdout.write(f"{alias}: режим {settings.DB_POOL_MODE}, SELECT 1 за {latency * 1000:.1f}мс")
+        stats = pool_stats(alias)
+        if stats is None:
+            self.stdout.write("Пул не включён")
+            return
+        for name, value in sorted(stats.items()):
+            self.stdout.write(f"  {name}: {value}")
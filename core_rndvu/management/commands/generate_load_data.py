@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core_rndvu.utils.synthetic_data import SYNTHETIC_TG_ID_START, SyntheticDataGenerator, purge_synthetic_data
+
+
+class Command(BaseCommand):
+    help = ("Синтетические данные для нагрузочных тестов (COPY пачками): игроки с анкетами и фото, симпатии, мэтчи, "
+            f"избранное, дизлайки, пропуски и ивенты. Игроки с tg_id от {SYNTHETIC_TG_ID_START}; прошлая синтетика "
+            "удаляется перед генерацией. Одинаковый --seed даёт одинаковые данные.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--players", type=int, default=100000, help="Сколько игроков создать.")
+        parser.add_argument("--seed", type=int, default=42, help="Seed генератора.")
+        parser.add_argument("--batch-size", type=int, default=10000, help="Строк в одном COPY.")
+        parser.add_argument("--sympathies", type=float, default=15, help="Среднее число симпатий на мужчину.")
+        parser.add_argument("--favorites", type=float, default=5, help="Среднее число избранных на игрока.")
+        parser.add_argument("--dislikes", type=float, default=3, help="Среднее число дизлайков на игрока.")
+        parser.add_argument("--events-share", type=float, default=0.1, help="Доля игроков с ивентами.")
+        parser.add_argument("--passes-share", type=float, default=0.02,
+                            help="Доля игроков с пропусками в сегодняшней ленте (карты в Redis).")
+        parser.add_argument("--purge", action="store_true", help="Только удалить синтетические данные.")
+        parser.add_argument("--force", action="store_true", help="Запустить при DEBUG=False.")
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["force"]:
+            raise CommandError("DEBUG=False: похоже на боевую базу. Если это стенд для нагрузки — добавьте --force")
+        started = time.monotonic()
+        purged = purge_synthetic_data()
+        if purged:
+            self.stdout.write(f"Удалено синтетических игроков: {purged}")
+        if options["purge"]:
+            return
+        generator = SyntheticDataGenerator(
+            options["players"], seed=options["seed"], batch_size=options["batch_size"],
+            sympathies=options["sympathies"], favorites=options["favorites"], dislikes=options["dislikes"],
+            events_share=options["events_share"], passes_share=options["passes_share"], log=self.stdout.write,
+        )
+        stats = generator.run()
+        total = sum(stats.values())
+        self.stdout.write(self.style.SUCCESS(f"✅ Создано строк: {total} за {time.monotonic() - started:.0f}с"))
@@ -0,0 +1,150 @@
+import asyncio
+import math
+import os
+import random
+import time
+from collections import defaultdict
+
+import httpx
+import orjson
+from django.core.management.base import BaseCommand, CommandError
+
+from core_rndvu.middleware.telegram_auth import build_init_data
+from core_rndvu.utils.synthetic_data import SYNTHETIC_TG_ID_START
+
+
+class Command(BaseCommand):
+    help = ("Нагрузочный тест API Mini App: виртуальные пользователи с настоящим подписанным init_data проходят "
+            "типичную сессию (вход, свайпы ленты с симпатиями и пропусками, анкеты, ивенты, мэтчи). "
+            "Сервер должен работать с тем же TOKEN, что передан в --bot-token; игроков заранее создаёт "
+            "generate_load_data. В конце — пропускная способность и p50/p95/p99 по каждой ручке.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="Адрес стенда.")
+        parser.add_argument("--bot-token", default=os.getenv("TOKEN"), help="Токен тестового бота (по умолчанию TOKEN).")
+        parser.add_argument("--users", type=int, default=50, help="Сколько виртуальных пользователей одновременно.")
+        parser.add_argument("--duration", type=float, default=60, help="Длительность теста, секунд.")
+        parser.add_argument("--ramp-up", type=float, default=10, help="За сколько секунд подключаются все пользователи.")
+        parser.add_argument("--think-time", type=float, default=0.5,
+                            help="Средняя пауза пользователя между действиями, секунд (0 — без пауз).")
+        parser.add_argument("--players", type=int, default=100000,
+                            help="Сколько игроков создано generate_load_data: из них выбираются пользователи.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--json", dest="json_path", help="Сохранить результаты в JSON-файл.")
+
+    def handle(self, *args, **options):
+        if not options["bot_token"]:
+            raise CommandError("Нужен токен тестового бота: --bot-token или переменная TOKEN")
+        self.options = options
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        started = time.perf_counter()
+        asyncio.run(self._run())
+        self._report(time.perf_counter() - started)
+
+    async def _run(self):
+        options = self.options
+        limits = httpx.Limits(max_connections=options["users"], max_keepalive_connections=options["users"])
+        async with httpx.AsyncClient(base_url=options["base_url"].rstrip("/") + "/api/", limits=limits,
+                                     timeout=30) as client:
+            self.deadline = time.monotonic() + options["ramp_up"] + options["duration"]
+            await asyncio.gather(*(self._user(client, n) for n in range(options["users"])))
+
+    async def _user(self, client, n):
+        """Виртуальный пользователь: сессия за сессией от лица случайного игрока, пока не выйдет время"""
+        rng = random.Random(f"{self.options['seed']}:{n}")
+        await asyncio.sleep(self.options["ramp_up"] * n / self.options["users"])
+        while time.monotonic() < self.deadline:
+            tg_id = SYNTHETIC_TG_ID_START + rng.randrange(self.options["players"])
+            init_data = build_init_data({"id": tg_id, "first_name": "Load", "language_code": "ru"},
+                                        self.options["bot_token"])
+            try:
+                await self._session(client, rng, {"X-Init-Data": init_data})
+            except _SessionAborted:
+                await self._think(rng)
+
+    async def _session(self, client, rng, headers):
+        """Типичная сессия: открыл приложение, полистал ленту, заглянул в ивенты и мэтчи"""
+        me = await self._request(client, headers, "POST", "player-info/")
+        player = me.get("player") or {}
+        if not player.get("gender"):
+            return
+        params = {"city": player["city"], "alpha2": player["alpha2"]} if player.get("city") else {}
+        for page in range(1, rng.randint(1, 3) + 1):
+            feed = await self._request(client, headers, "GET", "game/users/", params={**params, "page": page})
+            for user in feed.get("results", []):
+                await self._think(rng)
+                if rng.random() < 0.15:
+                    await self._request(client, headers, "GET", "player/profile/detail/",
+                                        params={"tg_id": user["tg_id"]})
+                # Большинство анкет пропускают
+                await self._request(client, headers, "POST", "sympathy/",
+                                    json={"tg_id": user["tg_id"], "skip": rng.random() < 0.7})
+        if rng.random() < 0.5:
+            events = await self._request(client, headers, "GET", "events/opposite/", params=params)
+            for event in rng.sample(events.get("results", []), min(2, len(events.get("results", [])))):
+                await self._think(rng)
+                await self._request(client, headers, "GET", f"events/opposite/{event['id']}/",
+                                    name="events/opposite/{id}/")
+        if rng.random() < 0.4:
+            await self._request(client, headers, "GET", "relations/count/")
+            await self._request(client, headers, "GET", "sympathy/mutual/cursor/")
+        if rng.random() < 0.3:
+            await self._request(client, headers, "GET", "favorites/cursor/")
+        await self._think(rng)
+
+    async def _think(self, rng):
+        if self.options["think_time"] > 0:
+            await asyncio.sleep(rng.expovariate(1 / self.options["think_time"]))
+
+    async def _request(self, client, headers, method, path, *, name=None, params=None, json=None) -> dict:
+        key = f"{method} {name or path}"
+        if time.monotonic() >= self.deadline:
+            raise _SessionAborted
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, headers=headers, params=params, json=json)
+        except httpx.HTTPError:
+            self.errors[key] += 1
+            raise _SessionAborted
+        self.latencies[key].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors[key] += 1
+            raise _SessionAborted
+        return orjson.loads(response.content)
+
+    def _report(self, elapsed):
+        rows = []
+        for key in sorted(set(self.latencies) | set(self.errors)):
+            latencies = sorted(self.latencies[key])
+            rows.append({
+                "endpoint": key,
+                "requests": len(latencies),
+                "errors": self.errors[key],
+                "rps": len(latencies) / elapsed,
+                **{f"p{q}": _percentile(latencies, q) * 1000 for q in (50, 95, 99)},
+                "max": (latencies[-1] if latencies else 0) * 1000,
+            })
+        total = sum(row["requests"] for row in rows)
+        self.stdout.write(f"{'ручка':<36}{'запросов':>9}{'ошибок':>8}{'запр/с':>9}"
+                          f"{'p50, мс':>9}{'p95, мс':>9}{'p99, мс':>9}{'max, мс':>9}")
+        for row in rows:
+            self.stdout.write(f"{row['endpoint']:<36}{row['requests']:>9}{row['errors']:>8}{row['rps']:>9.1f}"
+                              f"{row['p50']:>9.1f}{row['p95']:>9.1f}{row['p99']:>9.1f}{row['max']:>9.1f}")
+        self.stdout.write(f"Всего: {total} запросов за {elapsed:.0f}с, {total / elapsed:.1f} запр/с, "
+                          f"ошибок: {sum(self.errors.values())}")
+        if self.options["json_path"]:
+            with open(self.options["json_path"], "wb") as f:
+                f.write(orjson.dumps({"elapsed": elapsed, "users": self.options["users"], "endpoints": rows},
+                                     option=orjson.OPT_INDENT_2))
+
+
+class _SessionAborted(Exception):
+    """Ошибка ответа или конец теста: пользователь начинает новую сессию"""
+
+
+def _percentile(sorted_values, q):
+    """Перцентиль по ближайшему рангу"""
+    if not sorted_values:
+        return 0
+    return sorted_values[max(0, math.ceil(len(sorted_values) * q / 100) - 1)]
@@ -0,0 +1,87 @@
+import gzip
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:  # brotli не установлен — работаем только с gzip
+    brotli = None
+
+
+# Сжимаем только текстовые ответы: картинки (JPEG/PNG/WebP), архивы и т.п. уже сжаты
+COMPRESSIBLE_CONTENT_TYPES = ("application/json", "text/", "application/javascript", "application/xml", "image/svg+xml")
+
+
+def parse_accept_encoding(header: str) -> dict:
+    """Разбираем Accept-Encoding в словарь {кодировка: q}"""
+    encodings = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        encodings[name] = q
+    return encodings
+
+
+def choose_encoding(header: str):
+    """Выбираем br или gzip по Accept-Encoding клиента (br в приоритете при равном q)"""
+    encodings = parse_accept_encoding(header)
+    wildcard = encodings.get("*", 0.0)
+    candidates = []
+    if brotli is not None:
+        candidates.append(("br", encodings.get("br", wildcard)))
+    candidates.append(("gzip", encodings.get("gzip", wildcard)))
+    best, best_q = None, 0.0
+    for name, q in candidates:
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Сжатие больших JSON-ответов (избранное, симпатии, ивенты) в brotli/gzip.
+    MiddlewareMixin в async-режиме вызывает process_response через sync_to_async,
+    поэтому само сжатие не выполняется в event loop.
+    """
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header("Content-Encoding"):
+            return response
+        content_type = response.get("Content-Type", "").lower()
+        if not content_type.startswith(COMPRESSIBLE_CONTENT_TYPES):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if len(response.content) < getattr(settings, "COMPRESSION_MIN_SIZE", 1024):
+            return response
+
+        encoding = choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding == "br":
+            compressed = brotli.compress(response.content, quality=getattr(settings, "COMPRESSION_BROTLI_QUALITY", 5))
+        elif encoding == "gzip":
+            compressed = gzip.compress(response.content, compresslevel=getattr(settings, "COMPRESSION_GZIP_LEVEL", 6))
+        else:
+            return response
+        # Отдаём сжатый вариант, только если он действительно меньше
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers["Content-Length"] = str(len(compressed))
+        response.headers["Content-Encoding"] = encoding
+        # Сжатое представление уже не байт-в-байт исходное — делаем ETag слабым (RFC 9110, 8.8.1)
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        return response
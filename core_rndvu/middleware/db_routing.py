@@ -0,0 +1,29 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.deprecation import MiddlewareMixin
+
+from core_rndvu.db_router import REPLICA_DB_ALIAS, ais_sticky, amark_sticky, replica_configured, use_database
+from core_rndvu.middleware.telegram_auth import EXCLUDED_PATHS
+
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    """
+    GET-запросы API читают с реплики, если игрок недавно ничего не записывал; остальные методы работают
+    с primary и после успешного ответа (не 4xx/5xx: отклонённая запись ничего не изменила) ставят игроку метку
+    «прилипания». Стоит после AsyncTelegramAuthMiddleware (нужен telegram_user).
+    """
+    async def __call__(self, request):
+        if not replica_configured() or any(request.path.startswith(p) for p in EXCLUDED_PATHS):
+            return await self.get_response(request)
+        tg_id = (getattr(request, "telegram_user", None) or {}).get("id")
+        if request.method in SAFE_METHODS:
+            alias = DEFAULT_DB_ALIAS if await ais_sticky(tg_id) else REPLICA_DB_ALIAS
+            with use_database(alias):
+                return await self.get_response(request)
+        with use_database(DEFAULT_DB_ALIAS):
+            response = await self.get_response(request)
+        if tg_id and response.status_code < 400:
+            await amark_sticky(tg_id)
+        return response
@@ -0,0 +1,30 @@
+from time import perf_counter
+
+from django.utils.deprecation import MiddlewareMixin
+
+from core_rndvu.instrumentation import finish_request, inspect_request, observe_request, start_request
+
+
+API_PREFIX = "/api/"
+
+
+class RequestMetricsMiddleware(MiddlewareMixin):
+    """
+    Время, запросы к БД и рендеринг JSON по каждой ручке API (метрики http_request_* на /internal/metrics/).
+    Стоит первой после WhiteNoise, чтобы в замер попали авторизация и остальные middleware.
+    Метка route — имя маршрута из core_rndvu/urls.py (неизвестные пути — "unmatched", чтобы не плодить ряды).
+    """
+    async def __call__(self, request):
+        if not request.path.startswith(API_PREFIX):
+            return await self.get_response(request)
+        stats, token = start_request()
+        started = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_request(token)
+        match = getattr(request, "resolver_match", None)
+        route = match.url_name if match and match.url_name else "unmatched"
+        observe_request(stats, route, request.method, response.status_code, perf_counter() - started)
+        inspect_request(stats, route)
+        return response
@@ -1,8 +1,9 @@
 import os
-import json
 import hashlib
 import hmac
-from urllib.parse import parse_qsl, unquote, parse_qs
+import time
+from urllib.parse import parse_qsl, quote, unquote, parse_qs, urlencode
+import orjson
 from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
 from logger_conf import logger
@@ -10,16 +11,21 @@ from core_rndvu.models import BlacklistUser
 
 
 EXCLUDED_PATHS = ["/admin/", "/media/", "/static/", "/docs/", "/favicon.ico", "/rndvu/schema/",
-                  "/rndvu/schema/swagger-ui/", "/api/payment/webhook/"]
+                  "/rndvu/schema/swagger-ui/", "/api/payment/webhook/", "/internal/"]
+# Игрок тестового режима (test_mode / X-Test-Mode)
+TEST_MODE_TG_ID = 123456789
+# Отдельный логгер для отладки авторизации: LOG_LEVELS="gift_system.auth=DEBUG"
+auth_logger = logger.getChild("auth")
 
 
 def verify_telegram_auth(init_data: str, bot_token: str):
-    logger.debug(f"[1] Raw init_data: {init_data}")
     # Раскодируем URL-формат (но не парсим сразу!)
     init_data_unquoted = unquote(init_data)
     # Парсим как query string
     parsed_data = parse_qs(init_data_unquoted, keep_blank_values=True)
     qs_dict = {k: v[0] for k, v in parsed_data.items()}
+    # Сам init_data не пишем: это подписанные данные пользователя, по ним можно войти до истечения auth_date
+    auth_logger.debug("init_data: поля %s", sorted(qs_dict))
     # Извлекаем хеш для проверки
     hash_check = qs_dict.pop("hash", None)
     if not hash_check:
@@ -38,6 +44,19 @@ def verify_telegram_auth(init_data: str, bot_token: str):
     return ok, qs_dict
 
 
+def build_init_data(user: dict, bot_token: str, auth_date: int = None) -> str:
+    """
+    init_data, подписанный так же, как его подписывает Telegram (и проверяет verify_telegram_auth).
+    Для нагрузочных тестов со своим тестовым ботом — с настоящим токеном бота не использовать.
+    """
+    fields = {"auth_date": str(auth_date or int(time.time())), "query_id": f"load{user['id']}",
+              "user": orjson.dumps(user).decode()}
+    data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    secret_key = hmac.new(key=b"WebAppData", msg=bot_token.encode(), digestmod=hashlib.sha256).digest()
+    fields["hash"] = hmac.new(key=secret_key, msg=data_check_string.encode("utf-8"), digestmod=hashlib.sha256).hexdigest()
+    return urlencode(fields, quote_via=quote)
+
+
 class AsyncTelegramAuthMiddleware(MiddlewareMixin):
     async def __call__(self, request):
         if any(request.path.startswith(p) for p in EXCLUDED_PATHS):
@@ -47,7 +66,7 @@ class AsyncTelegramAuthMiddleware(MiddlewareMixin):
         test_mode = (request.GET.get("test_mode") or request.POST.get("test_mode") or request.headers.get("X-Test-Mode"))
         # Тестовый режим (для отладки)
         if str(test_mode).lower() in ("1", "true", "yes"):
-            request.telegram_user = {"id": 123456789, "first_name": "Test User", "language_code": "ru"}
+            request.telegram_user = {"id": TEST_MODE_TG_ID, "first_name": "Test User", "language_code": "ru"}
             return await self.get_response(request)
         # Основная проверка
         if not init_data:
@@ -60,8 +79,8 @@ class AsyncTelegramAuthMiddleware(MiddlewareMixin):
             return JsonResponse({"error": "Недопустимый init_data"}, status=403)
         # Парсим user (без изменений исходных данных)
         try:
-            request.telegram_user = json.loads(data["user"])
-        except json.JSONDecodeError:
+            request.telegram_user = orjson.loads(data["user"])
+        except orjson.JSONDecodeError:
             return JsonResponse({"error": "Неверный формат user данных"}, status=400)
         
         # Проверяем черный список по tg_id через связь с Player
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_rndvu', '0028_subscriptiongrant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Match',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(verbose_name='Дата симпатии')),
+                ('partner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core_rndvu.player', verbose_name='Пара')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='core_rndvu.player', verbose_name='Участник')),
+                ('sympathy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='core_rndvu.sympathy', verbose_name='Симпатия')),
+            ],
+            options={
+                'verbose_name': 'Мэтч',
+                'verbose_name_plural': 'Мэтчи',
+                'indexes': [models.Index(fields=['player', 'created_at'], name='core_rndvu__player__3c5d69_idx')],
+                'constraints': [models.UniqueConstraint(fields=('player', 'partner'), name='unique_match_player_partner')],
+            },
+        ),
+        # Заполняем мэтчи по уже существующим взаимным симпатиям: по строке на каждого участника
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO core_rndvu_match (player_id, partner_id, sympathy_id, created_at)
+                SELECT from_player_id, to_player_id, id, created_at FROM core_rndvu_sympathy WHERE is_mutual
+                UNION ALL
+                SELECT to_player_id, from_player_id, id, created_at FROM core_rndvu_sympathy WHERE is_mutual
+                ON CONFLICT (player_id, partner_id) DO NOTHING
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:06
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_rndvu', '0029_match'),
+    ]
+
+    # Раньше встречные симпатии могли гонкой оказаться двумя строками A → B и B → A.
+    # Перед уникальным индексом по паре сливаем такие дубли: старшая строка становится взаимной,
+    # младшая удаляется вместе со своими мэтчами, затем досоздаём недостающие строки Match.
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                """
+                UPDATE core_rndvu_sympathy keep SET is_mutual = TRUE
+                FROM core_rndvu_sympathy dup
+                WHERE dup.from_player_id = keep.to_player_id AND dup.to_player_id = keep.from_player_id
+                  AND keep.id < dup.id
+                """,
+                """
+                DELETE FROM core_rndvu_match m
+                USING core_rndvu_sympathy dup, core_rndvu_sympathy keep
+                WHERE m.sympathy_id = dup.id
+                  AND dup.from_player_id = keep.to_player_id AND dup.to_player_id = keep.from_player_id
+                  AND keep.id < dup.id
+                """,
+                """
+                DELETE FROM core_rndvu_sympathy dup
+                USING core_rndvu_sympathy keep
+                WHERE dup.from_player_id = keep.to_player_id AND dup.to_player_id = keep.from_player_id
+                  AND keep.id < dup.id
+                """,
+                """
+                INSERT INTO core_rndvu_match (player_id, partner_id, sympathy_id, created_at)
+                SELECT from_player_id, to_player_id, id, created_at FROM core_rndvu_sympathy WHERE is_mutual
+                UNION ALL
+                SELECT to_player_id, from_player_id, id, created_at FROM core_rndvu_sympathy WHERE is_mutual
+                ON CONFLICT (player_id, partner_id) DO NOTHING
+                """,
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='sympathy',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Least('from_player', 'to_player'), django.db.models.functions.comparison.Greatest('from_player', 'to_player'), name='unique_sympathy_pair'),
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_rndvu', '0030_sympathy_pair'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='PassedUser',
+        ),
+    ]
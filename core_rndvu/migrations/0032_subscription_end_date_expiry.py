@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_rndvu', '0031_delete_passeduser'),
+    ]
+
+    operations = [
+        # Остаток дней теперь считается из subscription_end_date. Активным подписчикам без даты окончания
+        # восстанавливаем её из счётчика, прежде чем удалить колонку.
+        migrations.RunSQL(
+            sql="""
+                UPDATE core_rndvu_player
+                SET subscription_end_date = (now() AT TIME ZONE 'Europe/Moscow')::date + count_days_paid_subscription::int
+                WHERE paid_subscription AND subscription_end_date IS NULL AND count_days_paid_subscription IS NOT NULL
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RemoveField(
+            model_name='player',
+            name='count_days_paid_subscription',
+        ),
+        migrations.AddIndex(
+            model_name='player',
+            index=models.Index(condition=models.Q(('paid_subscription', True)), fields=['subscription_end_date'], name='player_paid_sub_end_idx'),
+        ),
+    ]
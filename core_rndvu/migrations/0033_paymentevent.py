@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_rndvu', '0032_subscription_end_date_expiry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payment_id', models.CharField(max_length=100, verbose_name='ID платежа в ЮKassa')),
+                ('event_type', models.CharField(max_length=50, verbose_name='Тип события')),
+                ('payload', models.JSONField(verbose_name='Тело уведомления')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='Получено')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Обработано')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Попыток обработки')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Последняя ошибка')),
+            ],
+            options={
+                'verbose_name': 'Событие ЮKassa',
+                'verbose_name_plural': 'События ЮKassa',
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['received_at'], name='payment_event_pending_idx')],
+                'constraints': [models.UniqueConstraint(fields=('payment_id', 'event_type'), name='unique_payment_event')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:26
+
+import django.db.models.deletion
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Индексы на живых таблицах строим CONCURRENTLY — без блокировки записи, но вне транзакции
+    atomic = False
+
+    dependencies = [
+        ('core_rndvu', '0033_paymentevent'),
+    ]
+
+    operations = [
+        RemoveIndexConcurrently(
+            model_name='player',
+            name='core_rndvu__tg_id_2365e6_idx',
+        ),
+        migrations.AlterField(
+            model_name='userreactiondislike',
+            name='from_player',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='given_dislikes', to='core_rndvu.player'),
+        ),
+        AddIndexConcurrently(
+            model_name='event',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at'], name='event_active_recent_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='event',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['alpha2', 'city', '-created_at'], name='event_active_geo_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='player',
+            index=models.Index(condition=models.Q(('is_active', True), ('show_in_game', True)), fields=['gender', 'alpha2', 'city'], name='player_feed_geo_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='player',
+            index=models.Index(condition=models.Q(('is_active', True), ('show_in_game', True)), fields=['gender', '-registration_date'], name='player_feed_recent_idx'),
+        ),
+    ]
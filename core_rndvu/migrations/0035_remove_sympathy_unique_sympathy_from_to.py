@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:55
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_rndvu', '0034_feed_event_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='sympathy',
+            name='unique_sympathy_from_to',
+        ),
+    ]
@@ -3,10 +3,13 @@ from datetime import timedelta
 from django.conf import settings
 from django.contrib.postgres.fields import ArrayField
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Q, IntegerField, CharField, TextField, ForeignKey, CASCADE
+from django.db.models.functions import Greatest, Least
 from django.utils import timezone
 
+from core_rndvu.utils.cache_utils import invalidate_product_catalog
+from core_rndvu.utils.entitlement_utils import set_entitlement
 from core_rndvu.validators import validate_birth_date, validate_photo_size
 
 
@@ -27,15 +30,23 @@ class Player(models.Model):
     likes_count = models.IntegerField(default=0, verbose_name="Количество лайков профиля")
     dislikes_count = models.IntegerField(default=0, verbose_name="Количество дизлайков профиля")
     paid_subscription = models.BooleanField(default=False, verbose_name="Платная подписка/нет")
-    count_days_paid_subscription = models.PositiveBigIntegerField(blank=True, null=True,
-                                                                  verbose_name="Остаток дней платной подписки")
     subscription_end_date = models.DateField(null=True, blank=True, verbose_name="Дата окончания подписки")
     verification = models.BooleanField(default=False, verbose_name="Подтверждение профиля")
     link_tg = models.CharField(max_length=100, blank=True, null=True, verbose_name="Ссылка на Telegram")
 
 
     class Meta:
-        indexes = [models.Index(fields=["tg_id"])]
+        indexes = [
+            # Лента: пол + страна/город среди видимых анкет (is_active и show_in_game — условие частичного индекса)
+            models.Index(fields=["gender", "alpha2", "city"], condition=Q(is_active=True, show_in_game=True),
+                         name="player_feed_geo_idx"),
+            # Премиум-каталог без фильтра по месту: новые анкеты выбранного пола сразу в нужном порядке
+            models.Index(fields=["gender", "-registration_date"], condition=Q(is_active=True, show_in_game=True),
+                         name="player_feed_recent_idx"),
+            # Ночная задача выключает только истекающие подписки: диапазон по этому частичному индексу
+            models.Index(fields=["subscription_end_date"], condition=Q(paid_subscription=True),
+                         name="player_paid_sub_end_idx"),
+        ]
         verbose_name = "Пользователь"
         verbose_name_plural = "Пользователи"
 
@@ -52,16 +63,41 @@ class Player(models.Model):
             return 0
         return round((self.likes_count / total) * 100, 1)
 
+    @property
+    def count_days_paid_subscription(self):
+        """Остаток дней подписки — считается от subscription_end_date на момент чтения"""
+        if self.subscription_end_date is None:
+            return None
+        return max((self.subscription_end_date - timezone.localdate()).days, 0)
+
+    def extend_subscription(self, days: int):
+        """Продлеваем подписку на days дней (или начинаем новую, если прошлая закончилась)"""
+        today = timezone.localdate()
+        if self.subscription_end_date and self.subscription_end_date >= today:
+            self.subscription_end_date += timedelta(days=days)
+        else:
+            self.subscription_end_date = today + timedelta(days=days)
+        self.paid_subscription = True
+
     def save(self, *args, **kwargs):
         # Автоматически создаем ссылку при сохранении
         if self.tg_id:
             self.link_tg = f"https://t.me/{self.tg_id}"
         super().save(*args, **kwargs)
 
+    def delete(self, *args, **kwargs):
+        tg_id = self.tg_id
+        result = super().delete(*args, **kwargs)
+        # Подписку убираем из кэша премиума: иначе tg_id, зарегистрированный заново, получил бы премиум из хэша
+        # до следующей пересборки
+        transaction.on_commit(lambda: set_entitlement(tg_id, None))
+        return result
+
 
 class UserReactionDislike(models.Model):
     """Модель для отслеживания дизлайков пользователей"""
-    from_player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='given_dislikes')
+    # Отдельный индекс не нужен: from_player — первая колонка уникального индекса (from_player, to_player)
+    from_player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='given_dislikes', db_index=False)
     to_player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='received_dislikes')
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -226,7 +262,10 @@ class Sympathy(models.Model):
         verbose_name = "Симпатия"
         verbose_name_plural = "Симпатии"
         constraints = [
-            models.UniqueConstraint(fields=["from_player", "to_player"], name="unique_sympathy_from_to"),
+            # Одна строка на неупорядоченную пару (покрывает и повтор в ту же сторону) — ключ для
+            # INSERT ... ON CONFLICT в form_sympathy()
+            models.UniqueConstraint(Least("from_player", "to_player"), Greatest("from_player", "to_player"),
+                                    name="unique_sympathy_pair"),
             models.CheckConstraint(check=~models.Q(from_player=models.F("to_player")), name="sympathy_from_not_to"),
         ]
         indexes = [
@@ -240,23 +279,28 @@ class Sympathy(models.Model):
         return f"{self.from_player.tg_id} {arrow} {self.to_player.tg_id}"
 
 
-class PassedUser(models.Model):
-    """Пропущенные пользователи - когда пользователь нажал "не понравился" (skip)"""
-    from_player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name="passed_users", verbose_name="Кто пропустил")
-    to_player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name="passed_by_users", verbose_name="Кого пропустили")
-    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата пропуска")
+class Match(models.Model):
+    """
+    Мэтч глазами одного участника: на каждую взаимную симпатию две строки (player, partner) и (partner, player).
+    «Мои мэтчи» читаются одним проходом по индексу (player, created_at) вместо OR по from_player/to_player.
+    Строки удаляются каскадом вместе с симпатией.
+    """
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name="matches", verbose_name="Участник")
+    partner = models.ForeignKey(Player, on_delete=models.CASCADE, related_name="+", verbose_name="Пара")
+    sympathy = models.ForeignKey(Sympathy, on_delete=models.CASCADE, related_name="matches", verbose_name="Симпатия")
+    # Копия Sympathy.created_at, чтобы порядок списка совпадал с прежним
+    created_at = models.DateTimeField(verbose_name="Дата симпатии")
 
     class Meta:
-        verbose_name = "Пропущенный пользователь"
-        verbose_name_plural = "Пропущенные пользователи"
+        verbose_name = "Мэтч"
+        verbose_name_plural = "Мэтчи"
         constraints = [
-            models.UniqueConstraint(fields=["from_player", "to_player"], name="unique_passed_from_to"),
-            models.CheckConstraint(check=~models.Q(from_player=models.F("to_player")), name="passed_from_not_to"),
+            models.UniqueConstraint(fields=["player", "partner"], name="unique_match_player_partner"),
         ]
-        indexes = [models.Index(fields=["from_player", "created_at"]), models.Index(fields=["to_player"])]
+        indexes = [models.Index(fields=["player", "created_at"])]
 
     def __str__(self):
-        return f"{self.from_player.tg_id} пропустил {self.to_player.tg_id}"
+        return f"{self.player_id} ⇆ {self.partner_id}"
 
 
 class Event(models.Model):
@@ -333,6 +377,13 @@ class Event(models.Model):
         verbose_name = "Ивент"
         verbose_name_plural = "Ивенты"
         ordering = ['-created_at']
+        indexes = [
+            # Лента ивентов: активные, новые сначала — LIMIT страницы читается по индексу без сортировки
+            models.Index(fields=["-created_at"], condition=Q(is_active=True), name="event_active_recent_idx"),
+            # То же с фильтром по стране/городу
+            models.Index(fields=["alpha2", "city", "-created_at"], condition=Q(is_active=True),
+                         name="event_active_geo_idx"),
+        ]
 
     def __str__(self):
         return f"{self.id}, {self.city})"
@@ -370,6 +421,13 @@ class Product(models.Model):
             self.duration_days = 365
 
         super().save(*args, **kwargs)
+        # Каталог продуктов кэшируется (см. utils/cache_utils.py) — сбрасываем после коммита
+        transaction.on_commit(invalidate_product_catalog)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        transaction.on_commit(invalidate_product_catalog)
+        return result
 
     class Meta:
         verbose_name = "Подписка"
@@ -396,6 +454,33 @@ class Purchase(models.Model):
         return f"{self.player.tg_id} — {self.product.name}"
 
 
+class PaymentEvent(models.Model):
+    """
+    Сырое уведомление ЮKassa. Webhook только сохраняет его и сразу отвечает 200, применяет — Celery-воркер.
+    Уникальность (payment_id, event_type) делает повторные доставки одного события безвредными.
+    """
+    payment_id = models.CharField(max_length=100, verbose_name="ID платежа в ЮKassa")
+    event_type = models.CharField(max_length=50, verbose_name="Тип события")
+    payload = models.JSONField(verbose_name="Тело уведомления")
+    received_at = models.DateTimeField(auto_now_add=True, verbose_name="Получено")
+    processed_at = models.DateTimeField(null=True, blank=True, verbose_name="Обработано")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Попыток обработки")
+    last_error = models.TextField(blank=True, default="", verbose_name="Последняя ошибка")
+
+    class Meta:
+        verbose_name = "Событие ЮKassa"
+        verbose_name_plural = "События ЮKassa"
+        constraints = [
+            models.UniqueConstraint(fields=["payment_id", "event_type"], name="unique_payment_event"),
+        ]
+        # Досылка необработанных: только хвост без processed_at
+        indexes = [models.Index(fields=["received_at"], condition=Q(processed_at__isnull=True),
+                                name="payment_event_pending_idx")]
+
+    def __str__(self):
+        return f"{self.event_type} {self.payment_id}"
+
+
 class SubscriptionGrant(models.Model):
     """Ручная выдача подписки пользователю через админку"""
     player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name="subscription_grants", verbose_name="Пользователь")
@@ -420,18 +505,11 @@ class SubscriptionGrant(models.Model):
             self._apply_to_player()
 
     def _apply_to_player(self):
-        today = timezone.localdate()
-        extra_days = self.duration_days
         player = self.player
-        if player.subscription_end_date and player.subscription_end_date >= today:
-            player.subscription_end_date += timedelta(days=extra_days)
-        else:
-            player.subscription_end_date = today + timedelta(days=extra_days)
-        player.paid_subscription = True
-        if player.count_days_paid_subscription is None:
-            player.count_days_paid_subscription = 0
-        player.count_days_paid_subscription += extra_days
-        player.save(update_fields=["paid_subscription", "count_days_paid_subscription", "subscription_end_date"])
+        player.extend_subscription(self.duration_days)
+        player.save(update_fields=["paid_subscription", "subscription_end_date"])
+        end_date = player.subscription_end_date
+        transaction.on_commit(lambda: set_entitlement(player.tg_id, end_date))
 
 
 class BlacklistUser(models.Model):
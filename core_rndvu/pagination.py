@@ -0,0 +1,61 @@
+"""
+Курсорная пагинация по (created_at, id) — от новых к старым.
+
+Курсор указывает на последнюю отданную запись, следующая страница берётся условием
+created_at < c OR (created_at = c AND id < i). С индексами вида (owner, created_at) это
+диапазонный проход по индексу без OFFSET, поэтому страница стоит одинаково на любой глубине списка.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Курсор от клиента не удалось разобрать"""
+
+
+def encode_cursor(created_at: datetime, pk: int) -> str:
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise InvalidCursor("Некорректный cursor") from exc
+
+
+def parse_page_size(value) -> int:
+    """limit из query-параметров, зажатый в [1, MAX_PAGE_SIZE]"""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def after_cursor(cursor):
+    """Q-условие «строго старше курсора» (пустое, если курсора нет)"""
+    if not cursor:
+        return Q()
+    created_at, pk = decode_cursor(cursor)
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+
+
+def split_page(items, page_size, key=lambda obj: (obj.created_at, obj.id)):
+    """
+    items — до page_size + 1 записей в порядке (-created_at, -id).
+    Возвращает (записи страницы, next_cursor или None).
+    """
+    has_next = len(items) > page_size
+    items = items[:page_size]
+    next_cursor = encode_cursor(*key(items[-1])) if has_next and items else None
+    return items, next_cursor
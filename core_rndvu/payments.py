@@ -0,0 +1,97 @@
+"""
+Применение уведомлений ЮKassa (PaymentEvent) — выполняется в Celery-воркере, а не в webhook.
+
+Всё событие обрабатывается в одной транзакции под select_for_update: строка события, покупка и игрок
+блокируются, поэтому повторные доставки и параллельные воркеры не продлят подписку дважды.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core_rndvu.db_router import mark_sticky
+from core_rndvu.models import PaymentEvent, Player, Purchase
+from core_rndvu.utils.entitlement_utils import set_entitlement
+from logger_conf import logger
+
+
+# После стольких неудачных попыток событие больше не досылается автоматически — разбираемся вручную
+MAX_PAYMENT_EVENT_ATTEMPTS = 5
+
+
+# Уведомления, на которые подписан магазин; остальные webhook отклоняет, не сохраняя
+PAYMENT_EVENT_TYPES = frozenset({
+    "payment.succeeded", "payment.waiting_for_capture", "payment.canceled", "payment.expired", "refund.succeeded",
+})
+
+
+def parse_webhook_event(data: dict):
+    """(payment_id, event_type) из тела уведомления; ValueError, если их нет"""
+    event_type = data.get("event") if isinstance(data, dict) else None
+    payment_id = (data.get("object") or {}).get("id") if event_type else None
+    if not event_type or not payment_id:
+        raise ValueError("Missing data")
+    return str(payment_id), str(event_type)
+
+
+def purchase_payment_id(data: dict) -> str:
+    """ID платежа, к которому относится уведомление: у возврата object.id — ID возврата, платёж — в payment_id"""
+    obj = data["object"]
+    return str(obj.get("payment_id") if data["event"].startswith("refund.") else obj["id"])
+
+
+def _apply_payment_succeeded(payment_id: str):
+    """Покупка успешна — помечаем её и продлеваем подписку игрока (вызывается внутри транзакции)"""
+    try:
+        purchase = Purchase.objects.select_for_update().get(payment_id=payment_id)
+    except Purchase.DoesNotExist:
+        raise LookupError(f"Покупка не найдена: {payment_id}")
+    if purchase.is_successful:
+        logger.warning(f"⚠️ Покупка уже обработана: {payment_id}")
+        return
+    player = Player.objects.select_for_update().get(pk=purchase.player_id)
+    extra_days = purchase.product.duration_days
+    purchase.is_successful = True
+    purchase.save(update_fields=["is_successful"])
+    player.extend_subscription(extra_days)
+    player.save(update_fields=["paid_subscription", "subscription_end_date"])
+    tg_id, end_date = player.tg_id, player.subscription_end_date
+    transaction.on_commit(lambda: set_entitlement(tg_id, end_date))
+    # Игрок вернётся из оплаты и сразу запросит профиль — читаем его из primary, а не с отстающей реплики
+    transaction.on_commit(lambda: mark_sticky(tg_id))
+    logger.info(f"✅ Подписка активирована: +{extra_days} дней для {tg_id}, до {end_date}")
+
+
+def apply_payment_event(event_id: int) -> bool:
+    """
+    Применяем событие ровно один раз. Возвращает True, если событие обработано сейчас или раньше.
+    Ошибка записывается в событие (attempts/last_error) и пробрасывается дальше — для ретрая Celery.
+    """
+    try:
+        with transaction.atomic():
+            event = PaymentEvent.objects.select_for_update().get(pk=event_id)
+            if event.processed_at is not None:
+                return True
+            if event.event_type == "payment.succeeded":
+                _apply_payment_succeeded(event.payment_id)
+            elif event.event_type == "payment.waiting_for_capture":
+                logger.info("⏳ Платёж ожидает подтверждения (capture), ID: %s", event.payment_id)
+            elif event.event_type == "payment.canceled":
+                logger.warning("🚫 Платёж отменён, ID: %s", event.payment_id)
+            elif event.event_type == "payment.expired":
+                logger.warning("⌛ Платёж просрочен, ID: %s", event.payment_id)
+            elif event.event_type == "refund.succeeded":
+                logger.info("💸 Возврат успешно выполнен, ID: %s", event.payment_id)
+            else:
+                logger.info(f"📨 Необработанный тип события: {event.event_type}")
+            event.processed_at = timezone.now()
+            event.attempts += 1
+            event.last_error = ""
+            event.save(update_fields=["processed_at", "attempts", "last_error"])
+            return True
+    except PaymentEvent.DoesNotExist:
+        logger.error(f"❌ Событие ЮKassa не найдено: {event_id}")
+        return False
+    except Exception as e:
+        logger.error(f"❌ Ошибка обработки события ЮKassa {event_id}: {e}")
+        PaymentEvent.objects.filter(pk=event_id).update(attempts=F("attempts") + 1, last_error=str(e))
+        raise
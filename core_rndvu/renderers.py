@@ -0,0 +1,48 @@
+from time import perf_counter
+
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from core_rndvu.instrumentation import record_render
+
+
+# Всё, что orjson не умеет сам (Decimal, ленивые строки gettext_lazy, QuerySet, timedelta, ...),
+# отдаём стандартному энкодеру DRF — так формат совпадает с JSONRenderer
+_drf_default = JSONEncoder().default
+
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONRenderer(BaseRenderer):
+    """JSON-рендерер на orjson: тот же формат, что у rest_framework.renderers.JSONRenderer, но быстрее"""
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        options = ORJSON_OPTIONS
+        # Поддерживаем ?indent как у JSONRenderer: Accept: application/json; indent=4
+        if accepted_media_type and "indent=" in accepted_media_type:
+            options |= orjson.OPT_INDENT_2
+        started = perf_counter()
+        content = orjson.dumps(data, default=_drf_default, option=options)
+        record_render(perf_counter() - started)
+        return content
+
+
+class ORJSONParser(BaseParser):
+    """JSON-парсер на orjson"""
+    media_type = "application/json"
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
+
@@ -745,7 +745,8 @@ game_users_schema = extend_schema(
             type=bool,
             location=OpenApiParameter.QUERY,
             required=False,
-            description="Режим премиум-каталога (true/false). Если true - возвращает всех пользователей с сортировкой по дате регистрации, это вкладка пользователей"
+            description="Режим премиум-каталога (true/false). Если true - возвращает всех пользователей с сортировкой по дате регистрации, это вкладка пользователей. "
+                        "Работает только при действующей подписке, иначе отдаётся обычная игра и premium=false в ответе"
         ),
     ],
     responses={
@@ -1063,6 +1064,52 @@ favorite_delete_schema = extend_schema(
 )
 
 
+cursor_page_parameters = [
+    OpenApiParameter(name="cursor", type=str, location=OpenApiParameter.QUERY, required=False,
+                     description="Курсор следующей страницы из next_cursor прошлого ответа (без него — первая страница)"),
+    OpenApiParameter(name="limit", type=int, location=OpenApiParameter.QUERY, required=False,
+                     description="Размер страницы (по умолчанию 20, максимум 100)"),
+]
+
+favorite_page_schema = extend_schema(
+    tags=["Избранное"],
+    summary="Избранное постранично (курсор)",
+    description=(
+        "Возвращает избранных пользователей страницами от новых к старым.\n\n"
+        "Для следующей страницы передайте `cursor` из `next_cursor`. "
+        "Когда `has_next` = false, список закончился."
+    ),
+    parameters=cursor_page_parameters,
+    responses={
+        200: FavoritePageResponseSerializer,
+        400: OpenApiResponse(description="Некорректный cursor"),
+    }
+)
+
+mutual_sympathy_page_schema = extend_schema(
+    tags=["Симпатии"],
+    summary="Взаимные симпатии постранично (курсор)",
+    description=(
+        "Возвращает взаимные симпатии текущего пользователя страницами от новых к старым.\n\n"
+        "Для следующей страницы передайте `cursor` из `next_cursor`."
+    ),
+    parameters=cursor_page_parameters,
+    responses={
+        200: MutualSympathyPageResponseSerializer,
+        400: OpenApiResponse(description="Некорректный cursor"),
+    }
+)
+
+relations_count_schema = extend_schema(
+    tags=["Избранное"],
+    summary="Количество избранных и взаимных симпатий",
+    description="Лёгкая ручка для счётчиков: только количества, без карточек пользователей.",
+    responses={
+        200: RelationsCountResponseSerializer,
+        404: OpenApiResponse(description="Пользователь не найден"),
+    }
+)
+
 
 profile_detail_schema = extend_schema(
     tags=["Анкета"],
@@ -1345,10 +1392,13 @@ product_list = extend_schema(
     summary="Получить список платных продуктов",
     description=(
         "Возвращает список всех доступных платных продуктов (подписок).\n\n"
+        "Ответ кэшируется и отдаётся с заголовками `ETag`/`Cache-Control`. "
+        "Если прислать `If-None-Match` с прошлым ETag и каталог не менялся — вернётся 304 без тела.\n\n"
         "⚠️ Требуется заголовок `X-Init-Data` (init_data от Telegram WebApp)."
     ),
     responses={
         200: ProductSerializer(many=True),
+        304: OpenApiResponse(description="Каталог не изменился (совпал If-None-Match)"),
         400: OpenApiResponse(
             description="Неверные данные авторизации"
         ),
@@ -1356,21 +1406,48 @@ product_list = extend_schema(
 )
 
 
+choices_schema = extend_schema(
+    tags=["Справочники"],
+    summary="Получить справочники выбора (пол, языки)",
+    description=(
+        "Возвращает списки значений для выбора пола и языков анкеты.\n\n"
+        "Данные статичны и отдаются с заголовками `ETag`/`Cache-Control`. "
+        "Если прислать `If-None-Match` с прошлым ETag — вернётся 304 без тела.\n\n"
+        "Получив справочники здесь, остальные ручки можно вызывать с `?omit_choices=true` — "
+        "тогда `gender_choices`/`language_choices` не повторяются в каждом объекте ответа.\n\n"
+        "⚠️ Требуется заголовок `X-Init-Data` (init_data от Telegram WebApp)."
+    ),
+    responses={
+        200: inline_serializer(
+            name="ChoicesResponse",
+            fields={
+                "gender_choices": serializers.ListField(child=serializers.DictField()),
+                "language_choices": serializers.ListField(child=serializers.ListField()),
+            }
+        ),
+        304: OpenApiResponse(description="Справочники не изменились (совпал If-None-Match)"),
+    }
+)
+
+
 
 webhook_yookassa = extend_schema(
     tags=["Юкасса"],
     summary="Webhook YooKassa",
     description=(
         "ЮKassa шлёт сюда уведомления о платеже.\n\n"
+        "Событие сохраняется и сразу подтверждается (200), подписка активируется фоновым воркером. "
+        "Повторная доставка того же события ничего не меняет.\n\n"
         "В продакшене вызывается внешним сервисом; вручную трогать не нужно."
     ),
     responses={
         200: OpenApiResponse(description="OK (принято)"),
         400: OpenApiResponse(
             response=OpenApiTypes.OBJECT,
-            description="Недостаточно данных",
+            description="Недостаточно данных или неизвестный тип события",
             examples=[OpenApiExample("Missing data", value="Missing data")],
         ),
+        404: OpenApiResponse(description="Платёж не найден (мы его не создавали)"),
     },
 )
 
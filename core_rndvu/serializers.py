@@ -9,11 +9,31 @@ from core_rndvu.models import *
 from core_rndvu.models import LANGUAGE_CHOICES
 
 
-class PlayerSerializer(ModelSerializer):
+# Справочники одинаковы для всех объектов — собираем один раз, а не на каждый сериализуемый объект
+GENDER_CHOICES_DATA = [{"value": value, "label": label} for value, label in Player.GENDER_CHOICES]
+
+
+class OmitChoicesMixin:
+    """
+    Убирает поля-справочники (*_choices) из каждого объекта, если в контексте передан omit_choices=True.
+    Сами справочники клиент берёт один раз из ручки choices/.
+    """
+    choices_fields = ("gender_choices", "language_choices")
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.context.get("omit_choices"):
+            for name in self.choices_fields:
+                fields.pop(name, None)
+        return fields
+
+
+class PlayerSerializer(OmitChoicesMixin, ModelSerializer):
     """Сериализатор модели Player"""
     gender_choices = SerializerMethodField()
     like_ratio = serializers.FloatField(read_only=True)
     main_photo = SerializerMethodField()
+    count_days_paid_subscription = serializers.IntegerField(read_only=True, allow_null=True)
 
     class Meta:
         model = Player
@@ -22,10 +42,7 @@ class PlayerSerializer(ModelSerializer):
 
     @extend_schema_field(list[OpenApiTypes.OBJECT])
     def get_gender_choices(self, obj):
-        return [
-            {"value": value, "label": label}
-            for value, label in Player._meta.get_field("gender").choices
-        ]
+        return GENDER_CHOICES_DATA
 
     def _extract_main_photo(self, photos_queryset):
         photos_list = list(photos_queryset)
@@ -43,12 +60,13 @@ class PlayerSerializer(ModelSerializer):
         return None
 
 
-class PlayerFovariteSerializer(ModelSerializer):
+class PlayerFovariteSerializer(OmitChoicesMixin, ModelSerializer):
     """Сериализатор модели Player"""
     gender_choices = SerializerMethodField()
     like_ratio = serializers.FloatField(read_only=True)
     photos = SerializerMethodField()
     birth_date = SerializerMethodField()
+    count_days_paid_subscription = serializers.IntegerField(read_only=True, allow_null=True)
 
     class Meta:
         model = Player
@@ -57,10 +75,7 @@ class PlayerFovariteSerializer(ModelSerializer):
 
     @extend_schema_field(list[OpenApiTypes.OBJECT])
     def get_gender_choices(self, obj):
-        return [
-            {"value": value, "label": label}
-            for value, label in Player._meta.get_field("gender").choices
-        ]
+        return GENDER_CHOICES_DATA
 
     @extend_schema_field(list[OpenApiTypes.OBJECT])
     def get_photos(self, obj):
@@ -148,7 +163,7 @@ class FullProfileManSerializer(ModelSerializer):
         extra_kwargs = {'player': {'read_only': True}}  # Поле player только для чтения
 
 
-class ProfileWomanSerializer(ModelSerializer):
+class ProfileWomanSerializer(OmitChoicesMixin, ModelSerializer):
     """Сериализатор женской анкеты + чойчасы для языков"""
     language_choices = SerializerMethodField()
 
@@ -186,7 +201,7 @@ class WomanPhotoSerializer(ModelSerializer):
     #     return calc_like_ratio(getattr(obj, "likes_count", 0), getattr(obj, "dislikes_count", 0))
 
 
-class FullProfileWomanSerializer(ModelSerializer):
+class FullProfileWomanSerializer(OmitChoicesMixin, ModelSerializer):
     """Полный сериализатор женской анкеты с фото"""
     # Связываем с сериализатором фото
     photos = WomanPhotoSerializer(many=True, read_only=True)
@@ -363,6 +378,29 @@ class DeleteFavoriteResponseSerializer(serializers.Serializer):
     deleted = serializers.BooleanField()
 
 
+class FavoritePageItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    created_at = serializers.DateTimeField()
+    target = PlayerFovariteSerializer()
+
+
+class FavoritePageResponseSerializer(serializers.Serializer):
+    results = FavoritePageItemSerializer(many=True)
+    next_cursor = serializers.CharField(allow_null=True)
+    has_next = serializers.BooleanField()
+
+
+class MutualSympathyPageResponseSerializer(serializers.Serializer):
+    results = SympathySerializer(many=True)
+    next_cursor = serializers.CharField(allow_null=True)
+    has_next = serializers.BooleanField()
+
+
+class RelationsCountResponseSerializer(serializers.Serializer):
+    favorites = serializers.IntegerField()
+    mutual = serializers.IntegerField()
+
+
 class UserLikeRequestSerializer(serializers.Serializer):
     """Схема запроса для UserLikeView"""
     to_player_tg_id = serializers.CharField(help_text="Telegram ID игрока, которому ставим реакцию")
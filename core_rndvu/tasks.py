@@ -6,9 +6,12 @@ from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, WebAppInfo
 from celery import shared_task
-from django.db.models import F
+from django.conf import settings
 from django.utils import timezone
-from core_rndvu.models import Event, PassedUser, Player
+from core_rndvu.maintenance import batched_delete
+from core_rndvu.models import Event, PaymentEvent, Player
+from core_rndvu.payments import MAX_PAYMENT_EVENT_ATTEMPTS, apply_payment_event
+from core_rndvu.utils.entitlement_utils import rebuild_entitlements
 from logger_conf import logger
 
 
@@ -18,18 +21,17 @@ from logger_conf import logger
     retry_kwargs={'max_retries': 3},  # Максимум 3 попытки
     retry_backoff=True  # Экспоненциальная задержка между попытками
 )
-def decrement_subscription_days_daily():
+def expire_subscriptions_daily():
     """
-    Ежедневно уменьшает остаток дней подписки на 1 у активных подписчиков.
-    Если дни закончились — выключает paid_subscription.
+    Ежедневно выключает paid_subscription у тех, чья подписка закончилась.
+    Остаток дней считается из subscription_end_date при чтении, поэтому строки остальных подписчиков
+    не трогаем: один UPDATE по частичному индексу player_paid_sub_end_idx, только истекающие.
     """
-    # 1) уменьшаем на 1 у тех, у кого > 0
-    dec_count = (Player.objects.filter(paid_subscription=True, count_days_paid_subscription__gt=0).
-                 update(count_days_paid_subscription=F('count_days_paid_subscription') - 1))
-    # 2) у кого стало 0 — выключаем флаг подписки
-    off_count = (Player.objects.filter(paid_subscription=True, count_days_paid_subscription__lte=0).
-                 update(paid_subscription=False))
-    logger.info(f"Пользователям уменьшили дни: {dec_count}, отключили подписку: {off_count}")
+    today = timezone.localdate()
+    off_count = Player.objects.filter(paid_subscription=True, subscription_end_date__lte=today).update(paid_subscription=False)
+    # Заодно пересобираем кэш подписок: истёкшие уходят, расхождения (если были) исправляются
+    active_count = rebuild_entitlements()
+    logger.info(f"Отключили истёкшую подписку: {off_count}, активных подписок в кэше: {active_count}")
 
 
 @shared_task(
@@ -38,14 +40,50 @@ def decrement_subscription_days_daily():
     retry_kwargs={'max_retries': 3},
     retry_backoff=True
 )
-def delete_old_passed_users():
+def rebuild_entitlements_task():
+    """Пересобираем кэш подписок, если он пропал из Redis (ставит get_subscription_end)"""
+    active_count = rebuild_entitlements()
+    logger.info(f"Кэш подписок пересобран: активных подписок {active_count}")
+
+
+@shared_task(
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_kwargs={'max_retries': 3},
+    retry_backoff=True
+)
+def process_payment_event(event_id):
+    """Применяем сохранённое уведомление ЮKassa (см. core_rndvu/payments.py)"""
+    return apply_payment_event(event_id)
+
+
+@shared_task(acks_late=True)
+def process_pending_payment_events():
+    """
+    Досылаем события, которые не попали в очередь или упали во всех ретраях.
+    Берём только те, что лежат дольше минуты, чтобы не дублировать только что поставленные.
+    """
+    cutoff = timezone.now() - timedelta(minutes=1)
+    event_ids = list(
+        PaymentEvent.objects.filter(processed_at__isnull=True, received_at__lt=cutoff,
+                                    attempts__lt=MAX_PAYMENT_EVENT_ATTEMPTS)
+        .order_by("received_at").values_list("id", flat=True)[:500]
+    )
+    for event_id in event_ids:
+        process_payment_event.delay(event_id)
+    if event_ids:
+        logger.warning(f"Дослали необработанных событий ЮKassa: {len(event_ids)}")
+
+
+@shared_task(acks_late=True)
+def cleanup_payment_events():
     """
-    Удаляет записи PassedUser, которые старше 2 дней.
-    Это позволяет пропущенным пользователям снова появиться в игре через день.
+    Удаляем применённые уведомления ЮKassa старше PAYMENT_EVENT_RETENTION_DAYS. Повторные доставки ЮKassa
+    присылает в пределах суток, а поздний дубль безвреден: покупка уже is_successful. Необработанные
+    (упавшие во всех попытках) не трогаем — их разбирают вручную.
     """
-    one_day_ago = timezone.now() - timedelta(days=2)
-    deleted_count, _ = PassedUser.objects.filter(created_at__lt=one_day_ago).delete()
-    logger.info(f"Удалено записей о пропущенных пользователях старше 2 дней: {deleted_count}")
+    cutoff = timezone.now() - timedelta(days=settings.PAYMENT_EVENT_RETENTION_DAYS)
+    return batched_delete("payment_events", PaymentEvent, "processed_at < %s", [cutoff])
 
 
 async def _send_event_notifications(players, text):
@@ -7,11 +7,14 @@ urlpatterns = [
     path("player/delete/", PlayerDeleteView.as_view(), name='player_delete'),
     path("player/gender/", PlayerGenderUpdateView.as_view(), name='player_gender'),
     path("player/profile/", UserProfileView.as_view(), name='user_profile'),
-    path("player/main_photo/", UserMainPhotoView.as_view(), name='user_profile'),
+    path("player/main_photo/", UserMainPhotoView.as_view(), name='user_main_photo'),
     # path("photo-reaction/", PhotoReactionView.as_view(), name='photo_reaction'),
     path("game/users/", GameUsersView.as_view(), name='game_users'),
     path("sympathy/", SympathyView.as_view(), name='sympathy'),
     path("favorites/", FavoriteView.as_view(), name='favorites'),
+    path("favorites/cursor/", FavoritePageView.as_view(), name='favorites-cursor'),
+    path("sympathy/mutual/cursor/", MutualSympathyPageView.as_view(), name='sympathy-mutual-cursor'),
+    path("relations/count/", RelationsCountView.as_view(), name='relations-count'),
     path("player/profile/detail/", ProfileDetailView.as_view(), name="profile-detail"),
     path('events/', EventPlayerView.as_view(), name='events'),  # GET все, POST создать
     path('events/<int:event_id>/', EventPlayerView.as_view(), name='event-detail'),  # GET один, PATCH, DELETE
@@ -22,6 +25,7 @@ urlpatterns = [
     path('update-show-in-game/', UpdateShowInGameView.as_view(), name='update-show-in-game'),
 
     path('product-list/', ProductListView.as_view(), name='product-list'),
+    path('choices/', ChoicesView.as_view(), name='choices'),
     path("payment-create/", CreatePaymentView.as_view(), name='yookassa-create'),
     path('payment/webhook/', YookassaWebhookView.as_view(), name='yookassa-webhook'),
 ]
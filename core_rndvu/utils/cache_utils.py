@@ -0,0 +1,77 @@
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import patch_cache_control, quote_etag
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+
+PRODUCT_CATALOG_CACHE_KEY = "product_catalog:v1"
+# Сколько секунд держим каталог в памяти процесса, прежде чем сверяться с Redis.
+# Инвалидация на save() чистит локальный кэш только в текущем процессе, остальные воркеры
+# увидят изменения не позже, чем через этот интервал.
+PRODUCT_CATALOG_LOCAL_TTL = 30
+PRODUCT_CATALOG_MAX_AGE = 300
+
+_product_catalog_local = {"expires_at": 0.0, "payload": None}
+
+
+def make_etag(data) -> str:
+    """Строим сильный ETag по содержимому ответа (ключи сортируются, чтобы порядок не влиял)"""
+    raw = json.dumps(data, sort_keys=True, ensure_ascii=False, cls=DjangoJSONEncoder).encode("utf-8")
+    return quote_etag(hashlib.md5(raw).hexdigest())
+
+
+def etag_response(request, data, etag=None, max_age=PRODUCT_CATALOG_MAX_AGE):
+    """
+    Отдаём ответ с ETag/Cache-Control.
+    Если клиент прислал совпадающий If-None-Match — отвечаем 304 без тела.
+    """
+    etag = etag or make_etag(data)
+    if_none_match = request.headers.get("If-None-Match")
+    # Слабое сравнение: после сжатия ответа (CompressionMiddleware) клиент присылает W/"..."
+    client_etags = {e[2:] if e.startswith("W/") else e for e in parse_etags(if_none_match or "")}
+    if if_none_match and (etag in client_etags or if_none_match.strip() == "*"):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(data, status=status.HTTP_200_OK)
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=max_age)
+    return response
+
+
+async def get_product_catalog():
+    """
+    Каталог продуктов: память процесса -> Redis -> БД.
+    Возвращает словарь {"data": [...], "etag": '"..."'}.
+    """
+    now = time.monotonic()
+    payload = _product_catalog_local["payload"]
+    if payload is not None and _product_catalog_local["expires_at"] > now:
+        return payload
+
+    payload = await cache.aget(PRODUCT_CATALOG_CACHE_KEY)
+    if payload is None:
+        # Импортируем здесь, чтобы models.py мог импортировать этот модуль без циклов
+        from core_rndvu.models import Product
+        from core_rndvu.serializers import ProductSerializer
+
+        products = [product async for product in Product.objects.all().order_by("id")]
+        data = list(ProductSerializer(products, many=True).data)
+        payload = {"data": data, "etag": make_etag(data)}
+        await cache.aset(PRODUCT_CATALOG_CACHE_KEY, payload, timeout=None)
+
+    _product_catalog_local["payload"] = payload
+    _product_catalog_local["expires_at"] = now + PRODUCT_CATALOG_LOCAL_TTL
+    return payload
+
+
+def invalidate_product_catalog():
+    """Сбрасываем каталог продуктов в Redis и в памяти процесса (вызывается из Product.save/delete)"""
+    _product_catalog_local["payload"] = None
+    _product_catalog_local["expires_at"] = 0.0
+    cache.delete(PRODUCT_CATALOG_CACHE_KEY)
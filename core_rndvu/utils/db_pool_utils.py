@@ -0,0 +1,58 @@
+"""
+Состояние пула соединений с БД (settings.DB_POOL_MODE = "pool") и проверка живости соединения.
+
+Статистика берётся из psycopg_pool (get_stats) и отдаётся в метриках Prometheus: по времени ожидания
+соединения (requests_wait_ms) видно, что пул мал для нагрузки, раньше, чем запросы начнут падать с PoolTimeout.
+"""
+import time
+
+from django.db import connections
+
+from core_rndvu.metrics import CallbackMetric
+
+
+def pool_stats(alias: str = "default"):
+    """Статистика пула psycopg_pool (None — пул не включён для этого алиаса)"""
+    pool = connections[alias].pool
+    return pool.get_stats() if pool is not None else None
+
+
+def check_database(alias: str = "default") -> float:
+    """SELECT 1 через пул/соединение алиаса; возвращает время ответа в секундах, при сбое — исключение драйвера"""
+    started = time.perf_counter()
+    with connections[alias].cursor() as cursor:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+    return time.perf_counter() - started
+
+
+def _all_pool_stats():
+    """(алиас, пул) -> статистика: пул ORM ("orm") и async-пул нативного драйвера ("async")"""
+    from core_rndvu import async_db
+
+    stats = {(alias, "orm"): pool_stats(alias) for alias in connections}
+    stats.update({(alias, "async"): value for alias, value in async_db.pool_stats().items()})
+    return {key: value for key, value in stats.items() if value is not None}
+
+
+def _stats_by_alias(*fields):
+    def collect():
+        return {key: sum(stats.get(field, 0) for field in fields) for key, stats in _all_pool_stats().items()}
+    return collect
+
+
+DB_POOL_SIZE = CallbackMetric("db_pool_connections", "Открытые соединения пула", _stats_by_alias("pool_size"),
+                              labelnames=("alias", "pool"))
+DB_POOL_AVAILABLE = CallbackMetric("db_pool_connections_available", "Свободные соединения пула",
+                                   _stats_by_alias("pool_available"), labelnames=("alias", "pool"))
+DB_POOL_WAITING = CallbackMetric("db_pool_requests_waiting", "Запросы, ждущие соединение прямо сейчас",
+                                 _stats_by_alias("requests_waiting"), labelnames=("alias", "pool"))
+# Счётчики psycopg_pool накопительные с открытия пула (get_stats их не сбрасывает)
+DB_POOL_QUEUED = CallbackMetric("db_pool_requests_queued_total", "Запросы соединения, которым пришлось ждать",
+                                _stats_by_alias("requests_queued"), labelnames=("alias", "pool"), metric_type="counter")
+DB_POOL_WAIT = CallbackMetric("db_pool_requests_wait_seconds_total", "Суммарное время ожидания соединения",
+                              lambda: {k: v / 1000 for k, v in _stats_by_alias("requests_wait_ms")().items()},
+                              labelnames=("alias", "pool"), metric_type="counter")
+DB_POOL_ERRORS = CallbackMetric("db_pool_errors_total", "Таймауты выдачи, ошибки подключения и потерянные соединения",
+                                _stats_by_alias("requests_errors", "connections_errors", "connections_lost"),
+                                labelnames=("alias", "pool"), metric_type="counter")
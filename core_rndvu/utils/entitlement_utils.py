@@ -0,0 +1,108 @@
+"""
+Кэш подписок для проверок премиума в горячих ручках: Redis-хэш tg_id -> дата окончания подписки.
+
+Хэш обновляют все места, где меняется подписка (оплата, ручная выдача, сброс в админке, ночная задача,
+удаление игрока), поэтому проверка премиума — один HMGET без запроса в БД. Служебное поле READY_FIELD отмечает,
+что хэш собран целиком. Если его нет (Redis очищен), ручка не пересобирает хэш сама — иначе все запросы разом пошли бы
+в БД (и, на GET, в отстающую реплику): подписку одного игрока читаем из primary, а пересборку ставим в Celery
+одну на всех (блокировка REBUILD_LOCK_KEY).
+
+Пересборка не удаляет хэш, а досылает разницу со снимком БД (HSET/HDEL) под WATCH: если во время снимка
+пришла оплата (set_entitlement), снимок устарел — снимаем его заново, а не затираем свежую подписку.
+"""
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import WatchError
+
+
+ENTITLEMENTS_KEY = "entitlements:subscription_end"
+READY_FIELD = "__ready__"
+REBUILD_LOCK_KEY = "entitlements:rebuild_lock"
+REBUILD_LOCK_TTL = 5 * 60
+REBUILD_ATTEMPTS = 5
+
+
+def _load_entitlements() -> dict:
+    from core_rndvu.models import Player
+
+    today = timezone.localdate()
+    return {
+        str(tg_id): end_date.isoformat()
+        for tg_id, end_date in Player.objects.using(DEFAULT_DB_ALIAS)
+        .filter(paid_subscription=True, subscription_end_date__gt=today)
+        .values_list("tg_id", "subscription_end_date")
+    }
+
+
+def rebuild_entitlements() -> int:
+    """Сверяем хэш с БД (досылаем только разницу); возвращает число активных подписок"""
+    redis = get_redis_connection("default")
+    for _ in range(REBUILD_ATTEMPTS):
+        with redis.pipeline() as pipe:
+            pipe.watch(ENTITLEMENTS_KEY)
+            active = _load_entitlements()
+            cached = {field.decode(): value.decode() for field, value in pipe.hgetall(ENTITLEMENTS_KEY).items()}
+            cached.pop(READY_FIELD, None)
+            changed = {tg_id: end for tg_id, end in active.items() if cached.get(tg_id) != end}
+            gone = [tg_id for tg_id in cached if tg_id not in active]
+            pipe.multi()
+            pipe.hset(ENTITLEMENTS_KEY, mapping={**changed, READY_FIELD: 1})
+            if gone:
+                pipe.hdel(ENTITLEMENTS_KEY, *gone)
+            try:
+                pipe.execute()
+            except WatchError:
+                continue
+        redis.delete(REBUILD_LOCK_KEY)
+        return len(active)
+    raise WatchError(f"Хэш {ENTITLEMENTS_KEY} менялся во время каждой из {REBUILD_ATTEMPTS} пересборок")
+
+
+def set_entitlement(tg_id: int, end_date):
+    """Подписка игрока изменилась: end_date=None — подписки нет"""
+    redis = get_redis_connection("default")
+    if end_date is None:
+        redis.hdel(ENTITLEMENTS_KEY, str(tg_id))
+    else:
+        redis.hset(ENTITLEMENTS_KEY, str(tg_id), end_date.isoformat())
+
+
+def reset_entitlements(*tg_ids: int):
+    """Убираем игроков из хэша (удаление игроков): пересборка иначе дошлёт HDEL только при следующем запуске"""
+    if tg_ids:
+        get_redis_connection("default").hdel(ENTITLEMENTS_KEY, *map(str, tg_ids))
+
+
+def get_subscription_end(tg_id: int):
+    """Дата окончания подписки из кэша (None — подписки нет)"""
+    redis = get_redis_connection("default")
+    end_date, ready = redis.hmget(ENTITLEMENTS_KEY, [str(tg_id), READY_FIELD])
+    if ready is None:
+        # Хэш не собран: пересборку — в Celery (одну), а этому игроку отвечаем по БД
+        if redis.set(REBUILD_LOCK_KEY, 1, nx=True, ex=REBUILD_LOCK_TTL):
+            from core_rndvu.tasks import rebuild_entitlements_task
+
+            rebuild_entitlements_task.delay()
+        return _load_subscription_end(tg_id)
+    return date.fromisoformat(end_date.decode()) if end_date else None
+
+
+def _load_subscription_end(tg_id: int):
+    """Подписка одного игрока из primary: реплика может ещё не знать о только что прошедшей оплате"""
+    from core_rndvu.models import Player
+
+    return (Player.objects.using(DEFAULT_DB_ALIAS).filter(tg_id=tg_id, paid_subscription=True)
+            .values_list("subscription_end_date", flat=True).first())
+
+
+def has_active_subscription(tg_id: int) -> bool:
+    """Подписка действует, пока не наступил день окончания (как в Player.count_days_paid_subscription)"""
+    end_date = get_subscription_end(tg_id)
+    return end_date is not None and end_date > timezone.localdate()
+
+
+ahas_active_subscription = sync_to_async(has_active_subscription)
@@ -0,0 +1,60 @@
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core_rndvu.models import Sympathy
+
+
+SYMPATHY_CREATED = "created"    # новая симпатия player → recipient
+SYMPATHY_EXISTS = "exists"      # такая симпатия уже была
+SYMPATHY_MATCHED = "matched"    # встречная симпатия стала взаимной
+SYMPATHY_MUTUAL = "mutual"      # пара уже была взаимной
+
+# Одна строка на пару: уникальный индекс по (LEAST, GREATEST) — см. Sympathy.Meta.constraints.
+# Если пары нет — вставляем симпатию. Если есть встречная невзаимная — в том же операторе делаем её взаимной
+# и пишем обе строки Match. Повторная симпатия в ту же сторону и уже взаимная пара ничего не меняют
+# (DO UPDATE ... WHERE не срабатывает, RETURNING пустой).
+# Два одновременных свайпа A → B и B → A сериализуются на уникальном индексе: второй INSERT ждёт первый
+# и уходит в DO UPDATE, поэтому мэтч не теряется и дублей пары не бывает.
+FORM_SYMPATHY_SQL = """
+    WITH upsert AS (
+        INSERT INTO core_rndvu_sympathy (from_player_id, to_player_id, is_mutual, created_at)
+        VALUES (%s, %s, FALSE, %s)
+        ON CONFLICT (LEAST(from_player_id, to_player_id), GREATEST(from_player_id, to_player_id))
+        DO UPDATE SET is_mutual = TRUE
+        WHERE core_rndvu_sympathy.from_player_id = EXCLUDED.to_player_id AND NOT core_rndvu_sympathy.is_mutual
+        RETURNING id, from_player_id, to_player_id, created_at, (xmax = 0) AS inserted
+    ),
+    match AS (
+        INSERT INTO core_rndvu_match (player_id, partner_id, sympathy_id, created_at)
+        SELECT from_player_id, to_player_id, id, created_at FROM upsert WHERE NOT inserted
+        UNION ALL
+        SELECT to_player_id, from_player_id, id, created_at FROM upsert WHERE NOT inserted
+        ON CONFLICT (player_id, partner_id) DO NOTHING
+    )
+    SELECT id, inserted FROM upsert
+"""
+
+
+def form_sympathy(from_player_id: int, to_player_id: int):
+    """
+    Атомарно ставим симпатию from_player → to_player и при встречной симпатии формируем мэтч.
+    Возвращает (id симпатии пары, статус SYMPATHY_*).
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(FORM_SYMPATHY_SQL, [from_player_id, to_player_id, timezone.now()])
+            row = cursor.fetchone()
+        if row is not None:
+            sympathy_id, inserted = row
+            return sympathy_id, SYMPATHY_CREATED if inserted else SYMPATHY_MATCHED
+        # Пара уже была и не изменилась: либо повтор в ту же сторону, либо она уже взаимная
+        sympathy = Sympathy.objects.only("id", "is_mutual").get(
+            Q(from_player_id=from_player_id, to_player_id=to_player_id)
+            | Q(from_player_id=to_player_id, to_player_id=from_player_id)
+        )
+        return sympathy.id, SYMPATHY_MUTUAL if sympathy.is_mutual else SYMPATHY_EXISTS
+
+
+aform_sympathy = sync_to_async(form_sympathy)
@@ -0,0 +1,196 @@
+"""
+Множество «уже просмотренных» в игре для каждого игрока — SET в Redis с id игроков.
+
+Сюда попадают те, кому игрок поставил симпатию, и те, с кем у него мэтч. Раньше лента на каждый запрос
+собирала эти множества подзапросами NOT IN по Sympathy/Match; теперь это один SMEMBERS из Redis и один
+параметр-массив в запросе. Небольшие множества целых Redis хранит как intset — память растёт с числом
+просмотренных, а не с максимальным id игрока, как было бы у битовой карты.
+
+Множество — кэш над БД: если ключа нет (истёк TTL, сброшен), оно пересобирается из Sympathy/Match.
+Симпатия добавляет id (SADD), удаление связи убирает пару из множеств обоих (SREM). Каждая запись ещё и
+увеличивает версию feed:seen:{player}:v, а пересборка идёт под WATCH на версию: если между снимком из БД
+и записью в Redis пришла симпатия или удаление, снимок устарел — не кэшируем его, соберём при следующем чтении.
+
+Пропуски (skip) живут только в Redis: SET на каждый день feed:passed:{player}:{дата} с EXPIREAT.
+Пропуск держится, пока жив бакет его дня, — как раньше у PassedUser с ночной чисткой «старше 2 дней»,
+только удалять ничего не нужно: Redis сам выбрасывает бакет, а лента читает лишь живые.
+"""
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import BigIntegerField, BooleanField, F, Func, Value
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import WatchError
+
+
+SEEN_KEY = "feed:seen:{}"
+# Сколько держим множество неактивного игрока; каждое чтение продлевает срок
+SEEN_TTL = 3 * 24 * 60 * 60
+SEEN_VERSION_KEY = "feed:seen:{}:v"
+# Версия нужна только на время пересборки (доли секунды) — держим с запасом
+SEEN_VERSION_TTL = 5 * 60
+
+PASSED_KEY = "feed:passed:{}:{}"
+# Сколько прошлых дней (по местному времени) пропуск ещё действует, помимо сегодняшнего
+PASSED_DAYS = 2
+
+# Запись в множество просмотренных: версия растёт всегда (её ждёт WATCH пересборки), само множество меняем,
+# только если оно есть — иначе лента примет множество из одного id за полное
+_SEEN_WRITE = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call(ARGV[1], KEYS[1], ARGV[2])
+end
+return -1
+"""
+
+
+class NotInArray(Func):
+    """lhs <> ALL(массив): исключение по списку id одним параметром вместо тысяч плейсхолдеров NOT IN"""
+    arity = 2
+    output_field = BooleanField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        lhs, lhs_params = compiler.compile(self.source_expressions[0])
+        rhs, rhs_params = compiler.compile(self.source_expressions[1])
+        return f"{lhs} <> ALL({rhs})", (*lhs_params, *rhs_params)
+
+
+def exclude_seen(qs, seen_ids):
+    """Убираем из выборки игроков уже просмотренных"""
+    if not seen_ids:
+        return qs
+    return qs.filter(NotInArray(F("id"), Value(seen_ids, output_field=ArrayField(BigIntegerField()))))
+
+
+def _load_seen_ids(player_id: int) -> set:
+    """Пересборка из БД: кому я поставил симпатию + с кем у меня мэтч"""
+    from core_rndvu.models import Match, Sympathy
+
+    seen = set(Sympathy.objects.filter(from_player_id=player_id).values_list("to_player_id", flat=True))
+    seen.update(Match.objects.filter(player_id=player_id).values_list("partner_id", flat=True))
+    return seen
+
+
+def get_seen_ids(player_id: int) -> list:
+    """id игроков, которых не нужно показывать в игре player_id"""
+    redis = get_redis_connection("default")
+    key = SEEN_KEY.format(player_id)
+    pipe = redis.pipeline()
+    pipe.smembers(key)
+    pipe.expire(key, SEEN_TTL)
+    members, exists = pipe.execute()
+    if exists:
+        return [int(pk) for pk in members if pk != b"0"]
+    return list(_rebuild_seen(redis, player_id))
+
+
+def _rebuild_seen(redis, player_id: int) -> set:
+    """Снимок из БД в Redis, если за время снимка никто не писал в множество (WATCH на версию)"""
+    key = SEEN_KEY.format(player_id)
+    with redis.pipeline() as pipe:
+        pipe.watch(SEEN_VERSION_KEY.format(player_id))
+        ids = _load_seen_ids(player_id)
+        pipe.multi()
+        pipe.delete(key)
+        # Пустое множество в Redis не хранится — кладём 0 (id игроков начинаются с 1), чтобы ключ существовал
+        pipe.sadd(key, 0, *ids)
+        pipe.expire(key, SEEN_TTL)
+        try:
+            pipe.execute()
+        except WatchError:
+            pass
+    return ids
+
+
+def _write_seen(redis, command: str, player_id: int, other_id: int):
+    redis.eval(_SEEN_WRITE, 2, SEEN_KEY.format(player_id), SEEN_VERSION_KEY.format(player_id),
+               command, other_id, SEEN_VERSION_TTL)
+
+
+def mark_seen(player_id: int, other_id: int):
+    """Игрок player_id поставил симпатию other_id"""
+    _write_seen(get_redis_connection("default"), "SADD", player_id, other_id)
+
+
+def unmark_seen_pair(player_id: int, other_id: int):
+    """Симпатия между игроками удалена (вместе с мэтчем) — убираем каждого из множества другого"""
+    redis = get_redis_connection("default")
+    _write_seen(redis, "SREM", player_id, other_id)
+    _write_seen(redis, "SREM", other_id, player_id)
+
+
+def reset_seen(*player_ids: int):
+    """Сбрасываем множества игроков целиком: при следующем запросе ленты они пересоберутся"""
+    get_redis_connection("default").delete(*(SEEN_KEY.format(pk) for pk in player_ids))
+
+
+def _passed_days():
+    """Дни, бакеты которых ещё действуют: сегодня и PASSED_DAYS предыдущих"""
+    today = timezone.localdate()
+    return [today - timedelta(days=n) for n in range(PASSED_DAYS + 1)]
+
+
+def _passed_expire_at(day) -> int:
+    """Бакет дня day живёт до полуночи (day + PASSED_DAYS + 1) по местному времени"""
+    midnight = datetime.combine(day + timedelta(days=PASSED_DAYS + 1), time.min)
+    return int(timezone.make_aware(midnight).timestamp())
+
+
+def get_passed_ids(player_id: int) -> set:
+    """Кого player_id пропустил за последние дни"""
+    redis = get_redis_connection("default")
+    return {int(pk) for pk in redis.sunion([PASSED_KEY.format(player_id, day.isoformat()) for day in _passed_days()])}
+
+
+def mark_passed(player_id: int, other_id: int):
+    """player_id пропустил other_id — пишем в бакет сегодняшнего дня"""
+    today = timezone.localdate()
+    key = PASSED_KEY.format(player_id, today.isoformat())
+    pipe = get_redis_connection("default").pipeline()
+    pipe.sadd(key, other_id)
+    pipe.expireat(key, _passed_expire_at(today))
+    pipe.execute()
+
+
+def mark_passed_many(passes: dict):
+    """Пропуски пачкой {player_id: [other_id, ...]} в бакеты сегодняшнего дня (генератор тестовых данных)"""
+    today = timezone.localdate()
+    expire_at = _passed_expire_at(today)
+    pipe = get_redis_connection("default").pipeline(transaction=False)
+    for player_id, other_ids in passes.items():
+        if not other_ids:
+            continue
+        key = PASSED_KEY.format(player_id, today.isoformat())
+        pipe.sadd(key, *other_ids)
+        pipe.expireat(key, expire_at)
+    pipe.execute()
+
+
+def reset_passed(*player_ids: int):
+    """Снимаем все живые пропуски игроков"""
+    get_redis_connection("default").delete(
+        *(PASSED_KEY.format(pk, day.isoformat()) for pk in player_ids for day in _passed_days()))
+
+
+def unmark_passed(player_id: int, other_id: int):
+    """Пользователь передумал и поставил симпатию — снимаем пропуск во всех живых бакетах"""
+    pipe = get_redis_connection("default").pipeline()
+    for day in _passed_days():
+        pipe.srem(PASSED_KEY.format(player_id, day.isoformat()), other_id)
+    pipe.execute()
+
+
+def get_excluded_ids(player_id: int) -> list:
+    """Всё, что не показываем в игре: просмотренные (симпатии, мэтчи) и пропущенные"""
+    return sorted(set(get_seen_ids(player_id)) | get_passed_ids(player_id))
+
+
+aget_excluded_ids = sync_to_async(get_excluded_ids)
+amark_passed = sync_to_async(mark_passed)
+aunmark_passed = sync_to_async(unmark_passed)
+amark_seen = sync_to_async(mark_seen)
+aunmark_seen_pair = sync_to_async(unmark_seen_pair)
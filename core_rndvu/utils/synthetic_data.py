@@ -0,0 +1,400 @@
+"""
+Синтетические данные для нагрузочных тестов: сотни тысяч игроков с анкетами, фото, симпатиями, мэтчами,
+избранным, дизлайками, пропусками и ивентами в распределениях, похожих на продакшен.
+
+Строки пишутся COPY пачками по batch_size (в разы быстрее bulk_create и не перетирает заданные даты
+auto_now_add — регистрации, симпатии и ивенты «растянуты» во времени). Мэтчи собираются одним INSERT ... SELECT
+из взаимных симпатий, счётчики лайков/дизлайков — одним UPDATE из избранного/дизлайков.
+
+Всё детерминировано seed: один и тот же seed на пустой базе даёт те же анкеты и те же связи
+(отличаются только значения id из последовательностей). Синтетические игроки — это tg_id от SYNTHETIC_TG_ID_START,
+purge_synthetic_data() удаляет их вместе со всеми связанными строками и ключами Redis (просмотренные, пропуски,
+подписки в кэше премиума). Кэш подписок run() пересобирает в конце — премиум синтетических игроков виден сразу.
+"""
+import io
+import random
+import time
+from collections import defaultdict
+from datetime import timedelta
+from itertools import accumulate
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core_rndvu.models import (LANGUAGE_CHOICES, Event, Favorite, ManPhoto, Player, ProfileMan, ProfileWoman,
+                               Sympathy, UserReactionDislike, WomanPhoto)
+from core_rndvu.utils.entitlement_utils import rebuild_entitlements, reset_entitlements
+from core_rndvu.utils.seen_utils import mark_passed_many, reset_passed, reset_seen
+
+
+# Настоящие tg_id Telegram намного меньше — синтетику легко отличить и удалить
+SYNTHETIC_TG_ID_START = 10 ** 12
+
+# (alpha2, id города GeoNames, вес): столицы и курорты с длинным хвостом; None — город ещё не выбран
+CITIES = [
+    ("RU", 524901, 30), ("RU", 498817, 14), ("RU", 1496747, 4), ("RU", 1486209, 4), ("RU", 551487, 3.5),
+    ("RU", 520555, 3), ("RU", 542420, 3), ("RU", 491422, 2.5), ("KZ", 1526384, 3), ("KZ", 1526273, 2),
+    ("BY", 625144, 3), ("AE", 292223, 3), ("TR", 745044, 2.5), ("TR", 323777, 1.5), ("TH", 1609350, 1.5),
+    ("TH", 1151254, 1), ("GE", 611717, 1.5), ("AM", 616052, 1), ("RS", 792680, 1), (None, None, 3),
+]
+# (число фото в анкете, вес): анкеты без фото в ленту не попадают
+PHOTOS_PER_PROFILE = [(0, 4), (1, 22), (2, 25), (3, 21), (4, 15), (5, 13)]
+# Мэтч / симпатия от мужчины / симпатия от девушки
+SYMPATHY_KINDS = [("mutual", 15), ("man", 60), ("woman", 25)]
+# Сколько разных картинок-заглушек на пол: файлы общие, в БД у каждого фото своя строка
+PHOTO_POOL = 24
+PHOTO_PATH = "{}/synthetic/{}.jpg"
+
+MEN_NAMES = ["Александр", "Дмитрий", "Максим", "Иван", "Артём", "Никита", "Михаил", "Егор", "Андрей", "Илья"]
+WOMEN_NAMES = ["Анна", "Мария", "Алиса", "Виктория", "Полина", "Екатерина", "София", "Дарья", "Ксения", "Ева"]
+INTERESTS = ["Путешествия", "Книги", "Музыка", "Йога", "Кино", "Спорт", "Кулинария", "Искусство", "Танцы"]
+ABOUT = ["Люблю путешествовать и пробовать новое.", "Работаю в IT, по выходным — горы.", "Спорт и хорошая кухня.",
+         None, "Ищу интересное общение.", "Фотограф, люблю море."]
+
+
+def copy_objects(model, objs):
+    """
+    Вставка объектов модели через COPY (как bulk_create без возврата id). Значения берутся из атрибутов
+    как есть: auto_now_add и Model.save() не вызываются, поэтому даты и производные поля задаём сами.
+    """
+    fields = [f for f in model._meta.concrete_fields if not f.primary_key]
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ", ".join(connection.ops.quote_name(f.column) for f in fields)
+    with connection.cursor() as cursor:
+        # cursor.cursor — курсор psycopg под обёрткой Django
+        with cursor.cursor.copy(f"COPY {table} ({columns}) FROM STDIN") as copy:
+            for obj in objs:
+                copy.write_row([f.get_db_prep_save(getattr(obj, f.attname), connection) for f in fields])
+    return len(objs)
+
+
+def _synthetic_players_sql() -> str:
+    return f"SELECT id FROM {Player._meta.db_table} WHERE tg_id >= %s"
+
+
+# Порядок удаления: сначала строки, которые ссылаются на другие (FK в БД без ON DELETE CASCADE)
+_PURGE = [
+    ("core_rndvu_match", "player_id IN ({0}) OR partner_id IN ({0})"),
+    ("core_rndvu_sympathy", "from_player_id IN ({0}) OR to_player_id IN ({0})"),
+    ("core_rndvu_favorite", "owner_id IN ({0}) OR target_id IN ({0})"),
+    ("core_rndvu_userreactiondislike", "from_player_id IN ({0}) OR to_player_id IN ({0})"),
+    ("core_rndvu_manphoto", "profile_id IN (SELECT id FROM core_rndvu_profileman WHERE player_id IN ({0}))"),
+    ("core_rndvu_womanphoto", "profile_id IN (SELECT id FROM core_rndvu_profilewoman WHERE player_id IN ({0}))"),
+    ("core_rndvu_profileman", "player_id IN ({0})"),
+    ("core_rndvu_profilewoman", "player_id IN ({0})"),
+    ("core_rndvu_event", "profile_id IN ({0})"),
+    ("core_rndvu_purchase", "player_id IN ({0})"),
+    ("core_rndvu_subscriptiongrant", "player_id IN ({0})"),
+    ("core_rndvu_blacklistuser", "player_id IN ({0})"),
+    ("core_rndvu_player", "id IN ({0})"),
+]
+
+
+def purge_synthetic_data() -> int:
+    """Удаляем синтетических игроков со всеми связями и их ключи в Redis. Возвращает число удалённых игроков"""
+    players = list(Player.objects.filter(tg_id__gte=SYNTHETIC_TG_ID_START).values_list("id", "tg_id"))
+    if not players:
+        return 0
+    ids, tg_ids = zip(*players)
+    with transaction.atomic(), connection.cursor() as cursor:
+        for table, where in _PURGE:
+            cursor.execute(f"DELETE FROM {table} WHERE {where.format(_synthetic_players_sql())}",
+                           [SYNTHETIC_TG_ID_START] * where.count("{0}"))
+    for start in range(0, len(ids), 10000):
+        reset_seen(*ids[start:start + 10000])
+        reset_passed(*ids[start:start + 10000])
+        reset_entitlements(*tg_ids[start:start + 10000])
+    return len(ids)
+
+
+def ensure_photo_files():
+    """Картинки-заглушки в хранилище (один раз): разные цвета, чтобы фото в анкете отличались"""
+    from PIL import Image
+
+    for folder in ("men_photos", "women_photos"):
+        for k in range(PHOTO_POOL):
+            path = PHOTO_PATH.format(folder, k)
+            if default_storage.exists(path):
+                continue
+            image = Image.new("RGB", (600, 800), ((k * 67) % 256, (k * 131) % 256, (k * 29) % 256))
+            buf = io.BytesIO()
+            image.save(buf, format="JPEG", quality=80)
+            default_storage.save(path, ContentFile(buf.getvalue()))
+
+
+class SyntheticDataGenerator:
+    """
+    players — сколько игроков создать; sympathies/favorites/dislikes — среднее число связей на игрока
+    (экспоненциальное распределение: большинству немного, единицам много); events_share/passes_share — доля
+    игроков с ивентами и с пропусками в сегодняшней ленте. Популярность анкет неравномерная (Парето):
+    часть анкет собирает основную массу симпатий и избранного.
+    """
+
+    def __init__(self, players, *, seed=42, batch_size=10000, sympathies=15, favorites=5, dislikes=3,
+                 events_share=0.1, passes_share=0.02, log=None):
+        self.players = players
+        self.seed = seed
+        self.batch_size = batch_size
+        self.sympathies = sympathies
+        self.favorites = favorites
+        self.dislikes = dislikes
+        self.events_share = events_share
+        self.passes_share = passes_share
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+        self.today = timezone.localdate()
+        # По индексу игрока: id в БД, пол, дата регистрации, (страна, город).
+        # Анкеты по (пол, город) — кандидаты для связей, с накопленными весами популярности
+        self.ids, self.genders, self.registered, self.places = [], [], [], []
+        self.buckets = defaultdict(list)
+        self.cum_weights = {}
+        self.stats = {}
+
+    def _rng(self, phase: str) -> random.Random:
+        """Свой поток случайных чисел на фазу: отключение одной фазы не меняет данные остальных"""
+        return random.Random(f"{self.seed}:{phase}")
+
+    def _phase(self, name, func):
+        started = time.monotonic()
+        self.stats[name] = func()
+        self.log(f"{name}: {self.stats[name]} за {time.monotonic() - started:.1f}с")
+
+    def run(self) -> dict:
+        ensure_photo_files()
+        self._phase("players", self._create_players)
+        self._phase("profiles", self._create_profiles)
+        self._phase("photos", self._create_photos)
+        self._phase("sympathies", self._create_sympathies)
+        self._phase("matches", self._create_matches)
+        self._phase("favorites_dislikes", self._create_reactions)
+        self._phase("events", self._create_events)
+        self._phase("passes", self._create_passes)
+        # Подписки пишутся COPY мимо set_entitlement: без пересборки кэш премиума их не видит
+        self._phase("entitlements", rebuild_entitlements)
+        with connection.cursor() as cursor:
+            # Свежая статистика планировщика: иначе замеры идут по планам для почти пустых таблиц
+            for model in (Player, ProfileMan, ProfileWoman, ManPhoto, WomanPhoto, Sympathy, Favorite,
+                          UserReactionDislike, Event):
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+        return self.stats
+
+    def _chunks(self):
+        for start in range(0, self.players, self.batch_size):
+            yield range(start, min(start + self.batch_size, self.players))
+
+    def _pick(self, rng, gender, city_key, k, exclude=None):
+        """k разных анкет противоположного пола из того же города с учётом популярности"""
+        bucket = self.buckets.get((gender, city_key))
+        if not bucket or k <= 0:
+            return []
+        k = min(k, len(bucket))
+        picked = dict.fromkeys(rng.choices(bucket, cum_weights=self.cum_weights[(gender, city_key)], k=k * 2))
+        picked.pop(exclude, None)
+        return list(picked)[:k]
+
+    def _create_players(self):
+        rng = self._rng("players")
+        cities, city_weights = CITIES, [weight for *_, weight in CITIES]
+        popularity = {}
+        created = 0
+        for chunk in self._chunks():
+            objs = []
+            for i in chunk:
+                gender = rng.choices(["Man", "Woman", None], weights=[57, 41, 2])[0]
+                alpha2, city, _ = rng.choices(cities, weights=city_weights)[0]
+                # Регистрации: больше свежих, хвост до двух лет
+                registered = self.now - timedelta(days=min(rng.expovariate(1 / 180), 730),
+                                                  seconds=rng.randrange(86400))
+                paid = rng.random() < 0.08
+                tg_id = SYNTHETIC_TG_ID_START + i
+                names = MEN_NAMES if gender == "Man" else WOMEN_NAMES
+                objs.append(Player(
+                    tg_id=tg_id, first_name=rng.choice(names), username=f"synthetic{i}", gender=gender,
+                    city=city, alpha2=alpha2, registration_date=registered, hide_age_in_profile=rng.random() < 0.3,
+                    is_active=rng.random() < 0.97, show_in_game=rng.random() < 0.92, paid_subscription=paid,
+                    subscription_end_date=self.today + timedelta(days=rng.randint(1, 30)) if paid else None,
+                    verification=rng.random() < 0.3, link_tg=f"https://t.me/{tg_id}",
+                ))
+                self.genders.append(gender)
+                self.registered.append(registered)
+                self.places.append((alpha2, city))
+                # Без города нет ленты, а NULL = NULL в SQL ложно: такие игроки не попадают в кандидаты
+                # связей и сами их не заводят (_pick по бакету (пол, None) ничего не вернёт)
+                if gender and city:
+                    self.buckets[(gender, city)].append(i)
+                    popularity[i] = rng.paretovariate(1.2)
+            with transaction.atomic():
+                created += copy_objects(Player, objs)
+        id_by_tg = dict(Player.objects.filter(tg_id__gte=SYNTHETIC_TG_ID_START).values_list("tg_id", "id"))
+        self.ids = [id_by_tg[SYNTHETIC_TG_ID_START + i] for i in range(self.players)]
+        for key, bucket in self.buckets.items():
+            self.cum_weights[key] = list(accumulate(popularity[i] for i in bucket))
+        return created
+
+    def _create_profiles(self):
+        rng = self._rng("profiles")
+        languages = [code for code, _ in LANGUAGE_CHOICES]
+        created = 0
+        for chunk in self._chunks():
+            men, women = [], []
+            for i in chunk:
+                gender = self.genders[i]
+                if gender == "Man":
+                    age = min(max(int(rng.gauss(32, 7)), 18), 65)
+                    birth = self.today - timedelta(days=age * 365 + rng.randrange(365))
+                    men.append(ProfileMan(player_id=self.ids[i], birth_date=birth, about=rng.choice(ABOUT)))
+                elif gender == "Woman":
+                    age = min(max(int(rng.gauss(26, 4.5)), 18), 45)
+                    birth = self.today - timedelta(days=age * 365 + rng.randrange(365))
+                    women.append(ProfileWoman(
+                        player_id=self.ids[i], birth_date=birth, height=rng.randint(155, 182),
+                        weight=rng.randint(45, 72), bust_size=rng.randint(80, 102), waist_size=rng.randint(56, 76),
+                        hips_size=rng.randint(84, 106), languages=["RU"] + rng.sample(languages[1:], rng.randint(0, 2)),
+                        interests=", ".join(rng.sample(INTERESTS, 3)), about=rng.choice(ABOUT),
+                    ))
+            with transaction.atomic():
+                created += copy_objects(ProfileMan, men) + copy_objects(ProfileWoman, women)
+        return created
+
+    def _create_photos(self):
+        rng = self._rng("photos")
+        counts, weights = zip(*PHOTOS_PER_PROFILE)
+        created = 0
+        for profile_model, photo_model, folder in ((ProfileMan, ManPhoto, "men_photos"),
+                                                   (ProfileWoman, WomanPhoto, "women_photos")):
+            profiles = (profile_model.objects.filter(player__tg_id__gte=SYNTHETIC_TG_ID_START)
+                        .order_by("player__tg_id").values_list("id", "player__registration_date"))
+            batch = []
+            for profile_id, registered in profiles.iterator(chunk_size=self.batch_size):
+                for n in range(rng.choices(counts, weights=weights)[0]):
+                    batch.append(photo_model(
+                        profile_id=profile_id, image=PHOTO_PATH.format(folder, rng.randrange(PHOTO_POOL)),
+                        uploaded_at=registered + timedelta(minutes=n), main_photo=n == 0,
+                    ))
+                if len(batch) >= self.batch_size:
+                    created += self._flush(photo_model, batch)
+            created += self._flush(photo_model, batch)
+        return created
+
+    @staticmethod
+    def _flush(model, batch):
+        with transaction.atomic():
+            count = copy_objects(model, batch)
+        batch.clear()
+        return count
+
+    def _between(self, rng, a, b):
+        """Момент после регистрации обоих игроков"""
+        since = max(self.registered[a], self.registered[b])
+        return since + (self.now - since) * rng.random()
+
+    def _create_sympathies(self):
+        """Пары «мужчина — девушка» из одного города: каждая пара выбирается один раз со стороны мужчины"""
+        rng = self._rng("sympathies")
+        kinds, weights = zip(*SYMPATHY_KINDS)
+        created = 0
+        batch = []
+        for i in range(self.players):
+            if self.genders[i] != "Man":
+                continue
+            k = int(rng.expovariate(1 / self.sympathies)) if self.sympathies else 0
+            for j in self._pick(rng, "Woman", self.places[i][1], k):
+                kind = rng.choices(kinds, weights=weights)[0]
+                from_i, to_i = (j, i) if kind == "woman" or (kind == "mutual" and rng.random() < 0.5) else (i, j)
+                batch.append(Sympathy(from_player_id=self.ids[from_i], to_player_id=self.ids[to_i],
+                                      is_mutual=kind == "mutual", created_at=self._between(rng, i, j)))
+            if len(batch) >= self.batch_size:
+                created += self._flush(Sympathy, batch)
+        return created + self._flush(Sympathy, batch)
+
+    def _create_matches(self):
+        """Две строки Match на каждую взаимную симпатию — как в form_sympathy()"""
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO core_rndvu_match (player_id, partner_id, sympathy_id, created_at)
+                SELECT from_player_id, to_player_id, id, created_at FROM core_rndvu_sympathy
+                WHERE is_mutual AND from_player_id IN ({_synthetic_players_sql()})
+                UNION ALL
+                SELECT to_player_id, from_player_id, id, created_at FROM core_rndvu_sympathy
+                WHERE is_mutual AND from_player_id IN ({_synthetic_players_sql()})
+            """, [SYNTHETIC_TG_ID_START] * 2)
+            return cursor.rowcount
+
+    def _create_reactions(self):
+        """Избранное и дизлайки (для одной пары — что-то одно, как в UserLikeView), затем счётчики в Player"""
+        rng = self._rng("reactions")
+        favorites, dislikes = [], []
+        created = 0
+        for i in range(self.players):
+            gender = self.genders[i]
+            if not gender:
+                continue
+            n_favorites = int(rng.expovariate(1 / self.favorites)) if self.favorites else 0
+            n_dislikes = int(rng.expovariate(1 / self.dislikes)) if self.dislikes else 0
+            other = "Woman" if gender == "Man" else "Man"
+            picked = self._pick(rng, other, self.places[i][1], n_favorites + n_dislikes)
+            for j in picked[:n_favorites]:
+                favorites.append(Favorite(owner_id=self.ids[i], target_id=self.ids[j],
+                                          created_at=self._between(rng, i, j)))
+            for j in picked[n_favorites:]:
+                dislikes.append(UserReactionDislike(from_player_id=self.ids[i], to_player_id=self.ids[j],
+                                                    created_at=self._between(rng, i, j)))
+            if len(favorites) + len(dislikes) >= self.batch_size:
+                created += self._flush(Favorite, favorites) + self._flush(UserReactionDislike, dislikes)
+        created += self._flush(Favorite, favorites) + self._flush(UserReactionDislike, dislikes)
+        with transaction.atomic(), connection.cursor() as cursor:
+            for column, table, target in (("likes_count", "core_rndvu_favorite", "target_id"),
+                                          ("dislikes_count", "core_rndvu_userreactiondislike", "to_player_id")):
+                cursor.execute(f"""
+                    UPDATE core_rndvu_player p SET {column} = r.n
+                    FROM (SELECT {target} AS player_id, COUNT(*) AS n FROM {table} GROUP BY {target}) r
+                    WHERE p.id = r.player_id AND p.tg_id >= %s
+                """, [SYNTHETIC_TG_ID_START])
+        return created
+
+    def _create_events(self):
+        rng = self._rng("events")
+        fields = {name: [value for value, _ in Event._meta.get_field(name).choices]
+                  for name in ("duration", "place", "currency", "candidate", "gift")}
+        created = 0
+        batch = []
+        for i in range(self.players):
+            if not self.genders[i] or rng.random() >= self.events_share:
+                continue
+            alpha2, city = self.places[i]
+            for _ in range(rng.choice([1, 1, 1, 2, 2, 3])):
+                age = rng.randint(18, 30)
+                created_at = self.now - timedelta(days=rng.uniform(0, 30))
+                batch.append(Event(
+                    profile_id=self.ids[i], city=city, alpha2=alpha2,
+                    date=self.today + timedelta(days=rng.randint(0, 30)),
+                    min_age=age, max_age=age + rng.randint(5, 20),
+                    reward=rng.choice([0, 0, 100, 300, 500, 1000]), description=rng.choice(ABOUT),
+                    created_at=created_at, is_active=rng.random() < 0.85,
+                    **{name: rng.choice(values) for name, values in fields.items()},
+                ))
+            if len(batch) >= self.batch_size:
+                created += self._flush(Event, batch)
+        return created + self._flush(Event, batch)
+
+    def _create_passes(self):
+        """Пропуски живут только в Redis — пишем в бакеты сегодняшнего дня части игроков"""
+        rng = self._rng("passes")
+        passes = {}
+        created = 0
+        for i in range(self.players):
+            gender = self.genders[i]
+            if not gender or rng.random() >= self.passes_share:
+                continue
+            other = "Woman" if gender == "Man" else "Man"
+            picked = self._pick(rng, other, self.places[i][1], int(rng.expovariate(1 / 20)))
+            if picked:
+                passes[self.ids[i]] = [self.ids[j] for j in picked]
+                created += len(picked)
+            if len(passes) >= 1000:
+                mark_passed_many(passes)
+                passes.clear()
+        mark_passed_many(passes)
+        return created
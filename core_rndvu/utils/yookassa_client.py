@@ -0,0 +1,90 @@
+"""
+Общий HTTP-клиент ЮKassa: один пул соединений на процесс (keep-alive), явные таймауты и ограниченные повторы.
+
+Повторяем только то, что безопасно: сетевые ошибки/таймауты и ответы 429/5xx. ЮKassa гарантирует
+идемпотентность по заголовку Idempotence-Key, поэтому все попытки одного запроса идут с одним ключом —
+дубль платежа не создастся, даже если первый запрос дошёл, а ответ потерялся.
+"""
+import asyncio
+import time
+import weakref
+
+import httpx
+from django.conf import settings
+
+from core_rndvu.metrics import Counter, Histogram
+
+
+YOOKASSA_API_URL = "https://api.yookassa.ru/v3/"
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+YOOKASSA_LATENCY = Histogram(
+    "yookassa_request_duration_seconds", "Длительность одной попытки запроса к API ЮKassa",
+    labelnames=("method", "outcome"),
+)
+YOOKASSA_RETRIES = Counter("yookassa_request_retries_total", "Повторы запросов к API ЮKassa", labelnames=("method",))
+
+# Клиент привязан к event loop: под uvicorn он один на процесс, но async_to_sync (Celery, тесты, management-команды)
+# запускает свои циклы, в том числе параллельно основному. Поэтому клиент у каждого цикла свой: чужой закрывать
+# нельзя — на нём могут идти запросы. Закрывается клиент вместе со своим циклом (см. _close_with_loop)
+_clients = weakref.WeakKeyDictionary()
+
+
+def create_client(transport=None) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=YOOKASSA_API_URL,
+        auth=(settings.YOOKASSA_SHOP_ID or "", settings.YOOKASSA_SECRET_KEY or ""),
+        timeout=httpx.Timeout(settings.YOOKASSA_TIMEOUT, connect=settings.YOOKASSA_CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=settings.YOOKASSA_MAX_CONNECTIONS,
+                            max_keepalive_connections=settings.YOOKASSA_MAX_CONNECTIONS, keepalive_expiry=60),
+        transport=transport,
+    )
+
+
+async def _close_with_loop(client: httpx.AsyncClient):
+    """
+    Асинхронный генератор, живущий, пока жив цикл: asyncio.run, async_to_sync и uvicorn перед закрытием цикла
+    вызывают loop.shutdown_asyncgens(), и finally закрывает пул соединений клиента в его же цикле
+    """
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+async def get_client() -> httpx.AsyncClient:
+    """Общий клиент для текущего event loop"""
+    loop = asyncio.get_running_loop()
+    client, _ = _clients.get(loop, (None, None))
+    if client is None or client.is_closed:
+        client = create_client()
+        closer = _close_with_loop(client)
+        await closer.__anext__()
+        # Генератор держим вместе с клиентом: цикл хранит свои генераторы по слабым ссылкам
+        _clients[loop] = client, closer
+    return client
+
+
+async def post(path: str, json: dict, idempotence_key: str) -> httpx.Response:
+    """
+    POST в API ЮKassa с повторами. Ответ 4xx (кроме 429) возвращается сразу — его разбирает вызывающий код.
+    Сетевые ошибки после последней попытки пробрасываются как есть.
+    """
+    client = await get_client()
+    headers = {"Idempotence-Key": idempotence_key}
+    attempts = settings.YOOKASSA_MAX_RETRIES + 1
+    for attempt in range(attempts):
+        started = time.perf_counter()
+        try:
+            response = await client.post(path, json=json, headers=headers)
+        except httpx.TransportError as e:
+            YOOKASSA_LATENCY.observe(time.perf_counter() - started, method=path, outcome=type(e).__name__)
+            if attempt == attempts - 1:
+                raise
+        else:
+            YOOKASSA_LATENCY.observe(time.perf_counter() - started, method=path, outcome=str(response.status_code))
+            if response.status_code not in RETRY_STATUS_CODES or attempt == attempts - 1:
+                return response
+        YOOKASSA_RETRIES.inc(method=path)
+        # Экспоненциальная пауза: 0.5с, 1с, 2с ... (при retry_backoff=0.5)
+        await asyncio.sleep(settings.YOOKASSA_RETRY_BACKOFF * 2 ** attempt)
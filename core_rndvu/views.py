@@ -1,21 +1,38 @@
 import asyncio
+import hmac
+import ipaddress
 import json
 import math
 
 from adrf.generics import GenericAPIView
 from adrf.views import APIView
-from django.db.models import Prefetch, Count, Q, F, Case, When, DateField, Exists, OuterRef
+from django.conf import settings
+from django.db.models import Prefetch, Count, Q, F, Exists, OuterRef
+from django.http import HttpResponse
 from django.utils import timezone
 from datetime import timedelta
 from drf_spectacular.utils import extend_schema, extend_schema_view
 from rest_framework import status
-from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.response import Response
+from core_rndvu import async_db
+from core_rndvu import maintenance  # noqa: F401 — регистрирует метрики обслуживающих задач
+from core_rndvu.fast_serializers import favorite_player_data, game_user_data, sympathy_data
+from core_rndvu.metrics import render_metrics
 from core_rndvu.models import *
+from core_rndvu.pagination import InvalidCursor, after_cursor, parse_page_size, split_page
+from core_rndvu.renderers import ORJSONParser
 from core_rndvu.tasks import notify_opposite_gender_about_event
 from core_rndvu.schemas import *
 from core_rndvu.serializers import *
+from core_rndvu.utils import db_pool_utils  # noqa: F401 — регистрирует метрики пулов БД
+from core_rndvu.utils.cache_utils import etag_response, get_product_catalog, make_etag
+from core_rndvu.utils.entitlement_utils import ahas_active_subscription
 from core_rndvu.utils.image_utils import optimize_image
+from core_rndvu.utils.match_utils import (SYMPATHY_CREATED, SYMPATHY_EXISTS, SYMPATHY_MATCHED, SYMPATHY_MUTUAL,
+                                          aform_sympathy)
+from core_rndvu.utils.seen_utils import (aget_excluded_ids, amark_passed, amark_seen, aunmark_passed, aunmark_seen_pair,
+                                         exclude_seen)
 from core_rndvu.yookassa_webhook import create_yookassa_payment
 
 
@@ -27,6 +44,176 @@ def availability_init_data(request):
     return init_data
 
 
+SYMPATHY_MESSAGES = {
+    SYMPATHY_CREATED: "Симпатия создана",
+    SYMPATHY_EXISTS: "Симпатия уже есть",
+    SYMPATHY_MATCHED: "Совпадение! Взаимная симпатия",
+    SYMPATHY_MUTUAL: "Симпатия уже взаимная",
+}
+
+
+# Поля фото для prefetch: profile_id обязателен — по нему prefetch раскладывает фото по анкетам,
+# иначе Django догружает отложенное поле отдельным запросом на каждое фото
+PHOTO_FIELDS = ("id", "profile_id", "image", "uploaded_at", "main_photo")
+
+
+def matches_with_sympathy(qs):
+    """Мэтчи вместе с симпатией, обоими игроками, анкетами и фото — всё, что нужно sympathy_data()"""
+    return (
+        qs.select_related("sympathy", "sympathy__from_player", "sympathy__to_player",
+                          "sympathy__from_player__man_profile", "sympathy__from_player__woman_profile",
+                          "sympathy__to_player__man_profile", "sympathy__to_player__woman_profile")
+        .prefetch_related(
+            Prefetch("sympathy__from_player__man_profile__photos", queryset=ManPhoto.objects.only(*PHOTO_FIELDS)),
+            Prefetch("sympathy__to_player__man_profile__photos", queryset=ManPhoto.objects.only(*PHOTO_FIELDS)),
+            Prefetch("sympathy__from_player__woman_profile__photos", queryset=WomanPhoto.objects.only(*PHOTO_FIELDS)),
+            Prefetch("sympathy__to_player__woman_profile__photos", queryset=WomanPhoto.objects.only(*PHOTO_FIELDS)),
+        )
+    )
+
+
+def game_users_queryset(player, params, premium: bool, excluded_ids=()):
+    """
+    Выборка GameUsersView до пагинации. Премиум — каталог всех по дате регистрации (новые сначала),
+    иначе игра: случайный порядок без excluded_ids (просмотренные и пропущенные).
+    Отдельной функцией, чтобы тесты планов (EXPLAIN) проверяли тот же запрос, что уходит из ручки.
+    """
+    # Параметры запроса для фильтрации передаваемых в URL
+    city = params.get("city")
+    alpha2 = params.get("alpha2")
+    min_age = params.get("min_age")
+    max_age = params.get("max_age")
+    # Параметр для выбора пола: "Man" или "Woman". Если не указан - показываем противоположный пол
+    show_gender = params.get("gender")
+    if show_gender in ("Man", "Woman"):
+        target_gender = show_gender
+    else:
+        target_gender = "Woman" if player.gender == "Man" else "Man"
+
+    # Базовый QS: показываем выбранный пол + активные + показ в игре + исключает себя
+    qs = Player.objects.filter(gender=target_gender, is_active=True, show_in_game=True).exclude(id=player.id)
+    # Фильтр по стране, если передан (alpha2 как строка)
+    if alpha2 and alpha2.strip():
+        qs = qs.filter(alpha2=alpha2.strip().upper())
+    # Фильтр по городу (если задан)
+    if city:
+        try:
+            qs = qs.filter(city=int(city))
+        except ValueError:
+            pass
+    # Множества из Redis передаём одним параметром-массивом: id <> ALL(...)
+    if not premium:
+        qs = exclude_seen(qs, list(excluded_ids))
+
+    # Только с анкетой и хотя бы одним фото: Exists останавливается на первом фото и не умножает строки
+    profile, photo_model = ("man_profile", ManPhoto) if target_gender == "Man" else ("woman_profile", WomanPhoto)
+    qs = qs.filter(**{f"{profile}__isnull": False}).filter(
+        Exists(photo_model.objects.filter(profile=OuterRef(profile))))
+    # Дата рождения из анкеты показываемого пола (тот же JOIN, что и у select_related ниже)
+    qs = qs.annotate(birth_date_any=F(f"{profile}__birth_date"))
+
+    # Фильтр по возрасту через сравнение дат рождения
+    today = timezone.localtime()
+
+    def years_ago(years: int):
+        """Дата 'сегодня минус N лет'; фикс для 29 февраля."""
+        try:
+            return today.replace(year=today.year - years)
+        except ValueError:
+            return today.replace(month=2, day=28, year=today.year - years)
+
+    if min_age:
+        qs = qs.filter(birth_date_any__lte=years_ago(int(min_age)))
+    if max_age:
+        qs = qs.filter(birth_date_any__gte=years_ago(int(max_age) + 1) + timedelta(days=1))
+
+    # Анкета у игрока одна, фото проверяются через Exists — дубликатов нет, DISTINCT не нужен. Без него страница
+    # премиум-каталога читается прямо из player_feed_recent_idx по порядку, без сортировки всей выборки
+    qs = qs.order_by("-registration_date" if premium else "?")
+    # Префетчим фото показываемой анкеты (сериализатор вернёт главное)
+    return qs.select_related(profile).prefetch_related(
+        Prefetch(f"{profile}__photos", queryset=photo_model.objects.only(*PHOTO_FIELDS)))
+
+
+def opposite_events_queryset(player, params):
+    """
+    Выборка списка OppositeGenderEventsView до пагинации: активные ивенты противоположного пола по фильтрам,
+    новые сначала (страница — из event_active_recent_idx / event_active_geo_idx). Отдельно — для тестов планов.
+    """
+    # Определяем противоположный пол
+    opposite_gender = "Woman" if player.gender == "Man" else "Man"
+
+    # Базовый запрос с предзагрузкой всех данных
+    events_query = (Event.objects.select_related(
+        "profile",
+        "profile__woman_profile",
+        "profile__man_profile"
+    ).prefetch_related(
+        "profile__woman_profile__photos",
+        "profile__man_profile__photos"
+    ).filter(
+        is_active=True,
+        profile__gender=opposite_gender
+    ).exclude(profile=player))
+
+    # Фильтр по стране (alpha2 из GeoNames), если передан
+    alpha2 = params.get('alpha2')
+    if alpha2 and alpha2.strip():
+        events_query = events_query.filter(alpha2=alpha2.strip().upper())
+
+    # Фильтр по городу (если передан)
+    city = params.get('city')
+    if city and city.strip():
+        try:
+            city_int = int(city)
+            events_query = events_query.filter(city=city_int)
+        except ValueError:
+            pass
+
+    # Фильтр по минимальному возрасту (по умолчанию 18)
+    min_age_filter = params.get('min_age', '18')
+    try:
+        min_age = int(min_age_filter)
+        min_age = max(min_age, 18)
+    except ValueError:
+        min_age = 18
+
+    # Фильтр по максимальному возрасту (по умолчанию 99)
+    max_age_filter = params.get('max_age', '99')
+    try:
+        max_age = int(max_age_filter)
+        max_age = min(max_age, 99)
+    except ValueError:
+        max_age = 99
+
+    # Пересечение возрастных диапазонов: (min_age_event <= max_age_filter) и (max_age_event >= min_age_filter)
+    events_query = events_query.filter(
+        Q(min_age__lte=max_age) & Q(max_age__gte=min_age)
+    )
+
+    # Фильтр по верификации - только если явно запрошены верифицированные
+    verification_filter = params.get('verification')
+    if verification_filter and verification_filter.lower() in ['true', '1', 'yes']:
+        events_query = events_query.filter(profile__verification=True)
+
+    # Показываем только ивенты с датой сегодня и позже или без даты
+    today = timezone.now().date()
+    events_query = events_query.filter(Q(date__isnull=True) | Q(date__gte=today))
+
+    # Сортировка по дате создания (сначала новые)
+    return events_query.order_by('-created_at')
+
+
+def serializer_context(request, /, **extra):
+    """
+    Общий контекст для сериализаторов ответа.
+    ?omit_choices=true — не дублировать справочники (gender_choices, language_choices) в каждом объекте,
+    клиент берёт их один раз из ручки choices/.
+    """
+    omit_choices = request.query_params.get("omit_choices", "").lower() in ("1", "true", "yes")
+    return {"omit_choices": omit_choices, **extra}
+
+
 @extend_schema(**player_delete_schema)
 class PlayerDeleteView(APIView):
     """Удаление игрока и всех связанных данных (анкеты, фото, лайки, ивенты и т.п.)."""
@@ -35,7 +222,7 @@ class PlayerDeleteView(APIView):
         if not init_data:
             return Response({"error": "Не авторизован"}, status=status.HTTP_401_UNAUTHORIZED)
         try:
-            player = await Player.objects.aget(tg_id=init_data["id"])
+            player = await async_db.aget(Player.objects, tg_id=init_data["id"])
         except Player.DoesNotExist:
             return Response({"error": "Пользователь не найден"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -69,7 +256,8 @@ class PlayerInfoView(APIView):
             if not player.gender:
                 created = True
 
-            return Response({"created": created, "player": PlayerSerializer(player).data}, status=status.HTTP_200_OK)
+            return Response({"created": created, "player": PlayerSerializer(player, context=serializer_context(request)).data},
+                            status=status.HTTP_200_OK)
         except Exception as e:
             return Response({"error": "Ошибка при создании/получении игрока", "details": str(e)},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -101,27 +289,27 @@ class PlayerGenderUpdateView(APIView):
             try:
                 if gender == "Man":
                     profile, created = await ProfileMan.objects.aget_or_create(player=player)
-                    serializer = ProfileManSerializer(profile)
+                    serializer = ProfileManSerializer(profile, context=serializer_context(request))
                     if created or not getattr(player, "man_profile", None):
                         # чтобы PlayerSerializer не дергал sync .photos.all() в async-вью
                         profile._prefetched_objects_cache = {"photos": []}
                         player.man_profile = profile
                 else:
                     profile, created = await ProfileWoman.objects.aget_or_create(player=player)
-                    serializer = ProfileWomanSerializer(profile)
+                    serializer = ProfileWomanSerializer(profile, context=serializer_context(request))
                     if created or not getattr(player, "woman_profile", None):
                         profile._prefetched_objects_cache = {"photos": []}
                         player.woman_profile = profile
 
                 return Response({
-                    "player": PlayerSerializer(player).data,
+                    "player": PlayerSerializer(player, context=serializer_context(request)).data,
                     "profile": serializer.data,
                 }, status=status.HTTP_200_OK)
 
             except Exception as profile_error:
                 # Если ошибка в профиле, но игрок обновлён - возвращаем успех
                 return Response({
-                    "player": PlayerSerializer(player).data,
+                    "player": PlayerSerializer(player, context=serializer_context(request)).data,
                     "profile": None,
                     "warning": "Player updated but profile creation failed"
                 }, status=status.HTTP_200_OK)
@@ -134,14 +322,14 @@ class PlayerGenderUpdateView(APIView):
 @extend_schema_view(get=user_profile_get_schema, patch=user_profile_patch_schema, put=user_profile_put_schema)
 class UserProfileView(APIView):
     """Ручка для работы с анкетой пользователя (GET, PATCH, PUT)"""
-    parser_classes = [MultiPartParser, FormParser, JSONParser]
+    parser_classes = [MultiPartParser, FormParser, ORJSONParser]
 
     async def get(self, request):
         """Получить анкету пользователя с фото (без лайков/дизлайков на фото)"""
         init_data = availability_init_data(request)
         try:
             # Получаем игрока по tg_id
-            player = await Player.objects.aget(tg_id=init_data["id"])
+            player = await async_db.aget(Player.objects, tg_id=init_data["id"])
             if not player.gender:
                 return Response({"error": "Пол пользователя не указан"}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -153,7 +341,7 @@ class UserProfileView(APIView):
                     .prefetch_related("photos")
                 ).aget(player=player)
 
-                serializer = FullProfileManSerializer(profile, context={"request": request})
+                serializer = FullProfileManSerializer(profile, context=serializer_context(request, request=request))
 
             else:
                 # Просто подтягиваем фото без аннотаций реакций
@@ -163,7 +351,7 @@ class UserProfileView(APIView):
                     .prefetch_related("photos")
                 ).aget(player=player)
 
-                serializer = FullProfileWomanSerializer(profile, context={"request": request})
+                serializer = FullProfileWomanSerializer(profile, context=serializer_context(request, request=request))
 
             return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -185,7 +373,7 @@ class UserProfileView(APIView):
     async def _update_profile(self, request, partial=True):
         try:
             init_data = availability_init_data(request)
-            player = await Player.objects.aget(tg_id=init_data["id"])
+            player = await async_db.aget(Player.objects, tg_id=init_data["id"])
             if not player.gender:
                 return Response({"error": "Пол пользователя не указан"}, status=status.HTTP_400_BAD_REQUEST)
             is_man = player.gender == "Man"
@@ -270,7 +458,7 @@ class UserProfileView(APIView):
                 return Response({"error": f"Ошибка при повторном запросе анкеты: {e}"}, status=status.HTTP_400_BAD_REQUEST)
 
             serializer_cls = FullProfileManSerializer if is_man else FullProfileWomanSerializer
-            full = serializer_cls(profile_refetched, context={"request": request})
+            full = serializer_cls(profile_refetched, context=serializer_context(request, request=request))
             return Response(full.data, status=status.HTTP_200_OK)
 
         except Player.DoesNotExist:
@@ -406,7 +594,7 @@ class UserMainPhotoView(APIView):
         init_data = availability_init_data(request)
         try:
             # Получаем пользователя
-            player = await Player.objects.aget(tg_id=init_data["id"])
+            player = await async_db.aget(Player.objects, tg_id=init_data["id"])
             # Получаем данные от фронта
             photo_id = request.data.get("photo_id")
             if not photo_id:
@@ -547,165 +735,24 @@ class GameUsersView(APIView):
         # Проверяем авторизацию через Telegram
         init_data = availability_init_data(request)
         try:
-            player = await Player.objects.aget(tg_id=init_data["id"])
+            player = await async_db.aget(Player.objects, tg_id=init_data["id"])
             if not player.gender:
                 return Response({"error": "Пол пользователя не указан"}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Параметры запроса для фильтрации передаваемых в URL
-            city = request.query_params.get("city")
-            alpha2 = request.query_params.get("alpha2")
-            min_age = request.query_params.get("min_age")
-            max_age = request.query_params.get("max_age")
             page = int(request.query_params.get("page", 1) or 1)
-            premium = request.query_params.get("premium", "").lower() == "true"
-            # Параметр для выбора пола: "Man" или "Woman". Если не указан - показываем противоположный пол
-            show_gender = request.query_params.get("gender")
             if page < 1:
                 page = 1
-
-            # Определяем какой пол показывать
-            if show_gender and show_gender in ["Man", "Woman"]:
-                # Пользователь выбрал конкретный пол
-                target_gender = show_gender
-            else:
-                # По умолчанию показываем противоположный пол (старая логика)
-                target_gender = "Woman" if player.gender == "Man" else "Man"
-            
-            # Базовый QS: показываем выбранный пол + активные + показ в игре + исключает себя
-            qs = Player.objects.filter(gender=target_gender, is_active=True, show_in_game=True).exclude(id=player.id)
-
-            # Фильтр по стране, если передан (alpha2 как строка)
-            if alpha2 and alpha2.strip():
-                qs = qs.filter(alpha2=alpha2.strip().upper())
-
-            # Для премиум-пользователей - каталог всех пользователей (не игра)
-            if premium:
-                # Фильтр по городу (если задан)
-                if city:
-                    try:
-                        qs = qs.filter(city=int(city))
-                    except ValueError:
-                        pass
-                
-                # Фильтруем пользователей, у которых есть профиль и хотя бы одно фото
-                # Используем Exists вместо JOIN для лучшей производительности:
-                # - Не создает JOIN (быстрее)
-                # - Останавливается на первой найденной записи (не сканирует все фото)
-                # - Не умножает строки результата (не нужен distinct для этого фильтра)
-                if target_gender == "Man":
-                    qs = qs.filter(man_profile__isnull=False).filter(
-                        Exists(ManPhoto.objects.filter(profile=OuterRef("man_profile")))
-                    )
-                else:
-                    qs = qs.filter(woman_profile__isnull=False).filter(
-                        Exists(WomanPhoto.objects.filter(profile=OuterRef("woman_profile")))
-                    )
-                
-                # Аннотируем дату рождения для фильтрации по возрасту
-                qs = qs.annotate(
-                    birth_date_any=Case(When(gender="Man",   then=F("man_profile__birth_date")),
-                                        When(gender="Woman", then=F("woman_profile__birth_date")), output_field=DateField()))
-                
-                # Фильтр по возрасту через сравнение дат рождения
-                today = timezone.localtime()
-
-                def years_ago(years: int):
-                    """Дата 'сегодня минус N лет'; фикс для 29 февраля."""
-                    try:
-                        return today.replace(year=today.year - years)
-                    except ValueError:
-                        return today.replace(month=2, day=28, year=today.year - years)
-
-                if min_age:
-                    upper = years_ago(int(min_age))
-                    qs = qs.filter(birth_date_any__lte=upper)
-
-                if max_age:
-                    lower = years_ago(int(max_age) + 1) + timedelta(days=1)
-                    qs = qs.filter(birth_date_any__gte=lower)
-                
-                # Сортировка по дате регистрации (новые сначала)
-                qs = qs.order_by("-registration_date")
-                
-                # Убираем дубликаты после всех фильтров и сортировки
-                qs = qs.distinct()
-            else:
-                # Для обычных пользователей - игра с фильтрами по симпатиям и пропущенным
-                # Фильтр по городу (если задан)
-                if city:
-                    try:
-                        qs = qs.filter(city=int(city))
-                    except ValueError:
-                        pass
-
-                # Исключаем тех, кому Я поставил симпатию (я → он)
-                qs = qs.exclude(id__in=Sympathy.objects.filter(from_player=player).values_list("to_player_id", flat=True))
-                
-                # Исключаем взаимные симпатии (is_mutual=True) - тех, с кем уже есть взаимная симпатия
-                qs = qs.exclude(
-                    Q(id__in=Sympathy.objects.filter(from_player=player, is_mutual=True).values_list("to_player_id", flat=True))
-                    | Q(id__in=Sympathy.objects.filter(to_player=player, is_mutual=True).values_list("from_player_id", flat=True))
-                )
-                
-                # Исключаем пропущенных пользователей (те, кого мы пропустили)
-                qs = qs.exclude(id__in=PassedUser.objects.filter(from_player=player).values_list("to_player_id", flat=True))
-                
-                # Фильтруем пользователей, у которых есть профиль и хотя бы одно фото
-                # Используем Exists вместо JOIN для лучшей производительности:
-                # - Не создает JOIN (быстрее)
-                # - Останавливается на первой найденной записи (не сканирует все фото)
-                # - Не умножает строки результата (не нужен distinct для этого фильтра)
-                if target_gender == "Man":
-                    qs = qs.filter(man_profile__isnull=False).filter(
-                        Exists(ManPhoto.objects.filter(profile=OuterRef("man_profile")))
-                    )
-                else:
-                    qs = qs.filter(woman_profile__isnull=False).filter(
-                        Exists(WomanPhoto.objects.filter(profile=OuterRef("woman_profile")))
-                    )
-                
-                # Аннотируем ЕДИНУЮ дату рождения из соответствующего профиля.
-                qs = qs.annotate(
-                    birth_date_any=Case(When(gender="Man",   then=F("man_profile__birth_date")),
-                                        When(gender="Woman", then=F("woman_profile__birth_date")), output_field=DateField()))
-                
-                # Фильтр по возрасту через сравнение дат рождения
-                today = timezone.localtime()
-
-                def years_ago(years: int):
-                    """Дата 'сегодня минус N лет'; фикс для 29 февраля."""
-                    try:
-                        return today.replace(year=today.year - years)
-                    except ValueError:
-                        return today.replace(month=2, day=28, year=today.year - years)
-
-                if min_age:
-                    upper = years_ago(int(min_age))
-                    qs = qs.filter(birth_date_any__lte=upper)
-
-                if max_age:
-                    lower = years_ago(int(max_age) + 1) + timedelta(days=1)
-                    qs = qs.filter(birth_date_any__gte=lower)
-                
-                # Случайная выдача для игры
-                qs = qs.order_by("?")
-                
-                # Убираем дубликаты после всех фильтров и сортировки
-                qs = qs.distinct()
-            # ВАЖНО: префетчим фото соответствующего профиля (загружаем все фото, сериализатор вернет только главное)
-            if target_gender == "Man":
-                # Мужские фото: select_related чтобы иметь сам профиль, и префетч фото
-                qs = qs.select_related("man_profile").prefetch_related(
-                    Prefetch("man_profile__photos", queryset=ManPhoto.objects.only("id", "image", "uploaded_at", "main_photo")))
-            else:
-                # Женские фото select_related чтобы иметь сам профиль, и префетч фото
-                qs = qs.select_related("woman_profile").prefetch_related(
-                    Prefetch("woman_profile__photos", queryset=WomanPhoto.objects.only("id", "image", "uploaded_at", "main_photo")))
+            # Премиум-каталог только при действующей подписке (проверка по кэшу в Redis, без запроса в БД)
+            premium = (request.query_params.get("premium", "").lower() == "true"
+                       and await ahas_active_subscription(player.tg_id))
+            # В игре исключаем тех, кому Я поставил симпатию (я → он), тех, с кем уже есть мэтч, и пропущенных
+            excluded_ids = () if premium else await aget_excluded_ids(player.id)
+            qs = game_users_queryset(player, request.query_params, premium, excluded_ids)
 
             # Пагинация
             page_size = 10
             # Считаем всего и страницы для пагинации + зажимаем page на последнюю страницу
-            total_count = await qs.acount()
+            total_count = await async_db.acount(qs)
             if total_count == 0:
                 return Response({"results": [], "page": 1, "page_size": page_size, "total_count": 0,
                                  "total_pages": 0, "has_prev": False, "has_next": False, "prev_page": None,
@@ -716,13 +763,14 @@ class GameUsersView(APIView):
             start = (page - 1) * page_size
             end = start + page_size
             # Асинхронно достаём первых 10 пользователей
-            users = [obj async for obj in qs[start:end].aiterator()]
+            users = await async_db.afetch(qs[start:end])
             # Сериализация.
             # Сериализатор может читать `obj.birth_date_any` вместо «склейки».
             # Дадим ему в объект поле `birth_date` (чтобы get_age() не менять).
             for u in users:
                 u.birth_date = getattr(u, "birth_date_any", None)
-            data = GameUserSerializer(users, many=True).data
+            # Быстрый путь: тот же JSON, что и у GameUserSerializer, но без накладных расходов DRF на объект
+            data = [game_user_data(u) for u in users]
             return Response({
                 "results": data,
                 "page": page,
@@ -748,7 +796,7 @@ class SympathyView(APIView):
         init_data = availability_init_data(request)
         try:
             # Достаём пользователя, который делает запрос из init data
-            player = await Player.objects.aget(tg_id=init_data["id"])
+            player = await async_db.aget(Player.objects, tg_id=init_data["id"])
             # Принимаем от фронта tg_id пользователя
             tg_id = request.data.get("tg_id")
             if not tg_id:
@@ -772,61 +820,35 @@ class SympathyView(APIView):
             # Если skip=True, создаём запись о пропуске
             if skip:
                 # Удаляем симпатию если была (на случай если пользователь передумал)
-                await Sympathy.objects.filter(from_player=player, to_player=recipient).adelete()
-                await Sympathy.objects.filter(from_player=recipient, to_player=player).adelete()
-                # Создаём запись о пропуске
-                await PassedUser.objects.aget_or_create(from_player=player, to_player=recipient)
+                deleted, _ = await Sympathy.objects.filter(from_player=player, to_player=recipient).adelete()
+                deleted += (await Sympathy.objects.filter(from_player=recipient, to_player=player).adelete())[0]
+                # Запоминаем пропуск (бакет дня в Redis, истекает сам)
+                await amark_passed(player.id, recipient.id)
+                # Симпатия между парой удалилась — убираем пару из просмотренных обоих (обычный пропуск их не трогает)
+                if deleted:
+                    await aunmark_seen_pair(player.id, recipient.id)
                 return Response({"message": "Пользователь пропущен", "skipped": True}, status=status.HTTP_200_OK)
             
             # Если не skip, создаём симпатию (удаляем запись о пропуске если была)
-            await PassedUser.objects.filter(from_player=player, to_player=recipient).adelete()
+            await aunmark_passed(player.id, recipient.id)
             
-            # Сначала проверяем есть ли обратная симпатия (recipient → player)
-            # Если есть - обновляем её, делая взаимной
-            try:
-                reverse_sympathy = await (
-                    Sympathy.objects
-                    .select_related("from_player", "to_player", "from_player__man_profile", "from_player__woman_profile",
-                                    "to_player__man_profile", "to_player__woman_profile")
-                    .prefetch_related(
-                        Prefetch("from_player__man_profile__photos", queryset=ManPhoto.objects.only("id", "image", "uploaded_at", "main_photo")),
-                        Prefetch("to_player__man_profile__photos", queryset=ManPhoto.objects.only("id", "image", "uploaded_at", "main_photo")),
-                        Prefetch("from_player__woman_profile__photos", queryset=WomanPhoto.objects.only("id", "image", "uploaded_at", "main_photo")),
-                        Prefetch("to_player__woman_profile__photos", queryset=WomanPhoto.objects.only("id", "image", "uploaded_at", "main_photo")),
-                    )
-                ).aget(from_player=recipient, to_player=player)
-                # Есть обратная симпатия - обновляем её
-                if not reverse_sympathy.is_mutual:
-                    reverse_sympathy.is_mutual = True
-                    await reverse_sympathy.asave(update_fields=["is_mutual"])
-                    message = "Совпадение! Взаимная симпатия"
-                else:
-                    message = "Симпатия уже взаимная"
-                # Удаляем прямую симпатию если она была создана (чтобы не было дубликатов)
-                await Sympathy.objects.filter(from_player=player, to_player=recipient).adelete()
-                data = SympathySerializer(reverse_sympathy).data
-                return Response({"message": message, "sympathy": data}, status=status.HTTP_200_OK)
-            except Sympathy.DoesNotExist:
-                # Обратной симпатии нет - создаём/находим прямую запись player → recipient
-                obj, created = await Sympathy.objects.aget_or_create(
-                    from_player=player,
-                    to_player=recipient,
-                    defaults={"is_mutual": False}
+            # Одним атомарным upsert по паре: создаём симпатию или делаем встречную взаимной (мэтч)
+            sympathy_id, outcome = await aform_sympathy(player.id, recipient.id)
+            await amark_seen(player.id, recipient.id)
+            obj = await (
+                Sympathy.objects
+                .select_related("from_player", "to_player", "from_player__man_profile", "from_player__woman_profile",
+                                "to_player__man_profile", "to_player__woman_profile")
+                .prefetch_related(
+                    Prefetch("from_player__man_profile__photos", queryset=ManPhoto.objects.only(*PHOTO_FIELDS)),
+                    Prefetch("to_player__man_profile__photos", queryset=ManPhoto.objects.only(*PHOTO_FIELDS)),
+                    Prefetch("from_player__woman_profile__photos", queryset=WomanPhoto.objects.only(*PHOTO_FIELDS)),
+                    Prefetch("to_player__woman_profile__photos", queryset=WomanPhoto.objects.only(*PHOTO_FIELDS)),
                 )
-                # Загружаем связанные объекты для сериализатора
-                obj = await (
-                    Sympathy.objects
-                    .select_related("from_player", "to_player", "from_player__man_profile", "from_player__woman_profile",
-                                    "to_player__man_profile", "to_player__woman_profile")
-                    .prefetch_related(
-                        Prefetch("from_player__man_profile__photos", queryset=ManPhoto.objects.only("id", "image", "uploaded_at", "main_photo")),
-                        Prefetch("to_player__man_profile__photos", queryset=ManPhoto.objects.only("id", "image", "uploaded_at", "main_photo")),
-                        Prefetch("from_player__woman_profile__photos", queryset=WomanPhoto.objects.only("id", "image", "uploaded_at", "main_photo")),
-                        Prefetch("to_player__woman_profile__photos", queryset=WomanPhoto.objects.only("id", "image", "uploaded_at", "main_photo")),
-                    )
-                ).aget(pk=obj.pk)
-                message = "Симпатия создана" if created else "Симпатия уже есть"
-                return Response({"message": message, "sympathy": SympathySerializer(obj).data}, status=status.HTTP_200_OK)
+            ).aget(pk=sympathy_id)
+            message = SYMPATHY_MESSAGES[outcome]
+            data = SympathySerializer(obj, context=serializer_context(request)).data
+            return Response({"message": message, "sympathy": data}, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -834,30 +856,13 @@ class SympathyView(APIView):
         # Проверяем авторизацию через Telegram
         init_data = availability_init_data(request)
         try:
-            player = await Player.objects.aget(tg_id=init_data["id"])
+            player = await async_db.aget(Player.objects, tg_id=init_data["id"])
 
-            # Только взаимные пары, где я участник
-            qs = (
-                Sympathy.objects.filter(is_mutual=True)
-                .filter(Q(from_player=player) | Q(to_player=player))
-                .select_related(
-                    "from_player",
-                    "to_player",
-                    "from_player__man_profile",
-                    "from_player__woman_profile",
-                    "to_player__man_profile",
-                    "to_player__woman_profile",
-                )
-                .prefetch_related(
-                    Prefetch("from_player__man_profile__photos", queryset=ManPhoto.objects.only("id", "image", "uploaded_at", "main_photo")),
-                    Prefetch("to_player__man_profile__photos", queryset=ManPhoto.objects.only("id", "image", "uploaded_at", "main_photo")),
-                    Prefetch("from_player__woman_profile__photos", queryset=WomanPhoto.objects.only("id", "image", "uploaded_at", "main_photo")),
-                    Prefetch("to_player__woman_profile__photos", queryset=WomanPhoto.objects.only("id", "image", "uploaded_at", "main_photo")),
-                )
-                .order_by("-created_at")
-            )
-            items = [s async for s in qs.aiterator()]
-            data = SympathySerializer(items, many=True).data
+            # Только взаимные пары, где я участник: строки Match по индексу (player, created_at)
+            qs = matches_with_sympathy(Match.objects.filter(player=player)).order_by("-created_at")
+            omit_choices = serializer_context(request)["omit_choices"]
+            # Быстрый путь: тот же JSON, что и у SympathySerializer
+            data = [sympathy_data(match.sympathy, omit_choices) for match in await async_db.afetch(qs)]
             return Response({"mutual": data}, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -867,7 +872,7 @@ class SympathyView(APIView):
         init_data = availability_init_data(request)
         try:
             # Достаём пользователя, который делает запрос из init data
-            player = await Player.objects.aget(tg_id=init_data["id"])
+            player = await async_db.aget(Player.objects, tg_id=init_data["id"])
             # Принимаем от фронта tg_id пользователя, которому дуляем симпатию
             tg_id = request.data.get("tg_id")
             if not tg_id:
@@ -884,12 +889,14 @@ class SympathyView(APIView):
             sympathy = await Sympathy.objects.filter(from_player=player, to_player=other).afirst()
             if sympathy:
                 await sympathy.adelete()
+                await aunmark_seen_pair(player.id, other.id)
                 return Response({"deleted": True}, status=status.HTTP_200_OK)
 
             # Не нашли — пробуем обратное направление other -> me
             sympathy = await Sympathy.objects.filter(from_player=other, to_player=player).afirst()
             if sympathy:
                 await sympathy.adelete()
+                await aunmark_seen_pair(player.id, other.id)
                 return Response({"deleted": True}, status=status.HTTP_200_OK)
             # Вообще нет симпатии между парой - это нормально, пользователь просто пропустил профиль
             return Response({"deleted": False, "message": "Симпатия не найдена"}, status=status.HTTP_200_OK)
@@ -935,15 +942,17 @@ class FavoriteView(APIView):
         init_data = availability_init_data(request)
         try:
             # Получаем пользователя
-            player = await Player.objects.aget(tg_id=init_data["id"])
+            player = await async_db.aget(Player.objects, tg_id=init_data["id"])
             qs = (Favorite.objects.filter(owner=player).select_related("target", "target__man_profile", "target__woman_profile")
                   .prefetch_related("target__man_profile__photos", "target__woman_profile__photos").order_by("-created_at"))
+            omit_choices = serializer_context(request)["omit_choices"]
             items = []
             async for fav in qs.aiterator():
                 items.append({
                     "id": fav.id,
                     "created_at": fav.created_at,
-                    "target": PlayerFovariteSerializer(fav.target).data,
+                    # Быстрый путь: тот же JSON, что и у PlayerFovariteSerializer
+                    "target": favorite_player_data(fav.target, omit_choices),
                 })
             return Response({"results": items, "count": len(items)}, status=status.HTTP_200_OK)
         except Exception as e:
@@ -954,7 +963,7 @@ class FavoriteView(APIView):
         init_data = availability_init_data(request)
         try:
             # Получаем пользователя
-            player = await Player.objects.aget(tg_id=init_data["id"])
+            player = await async_db.aget(Player.objects, tg_id=init_data["id"])
             tg_id = request.data.get("tg_id")
             if not tg_id:
                 return Response({"error": "Укажите tg_id"}, status=status.HTTP_400_BAD_REQUEST)
@@ -979,7 +988,7 @@ class FavoriteView(APIView):
             return Response({
                 "id": favorite.id,
                 "created_at": favorite.created_at,
-                "target": PlayerFovariteSerializer(favorite.target).data
+                "target": PlayerFovariteSerializer(favorite.target, context=serializer_context(request)).data
             }, status=status.HTTP_201_CREATED)
 
         except Exception as e:
@@ -990,7 +999,7 @@ class FavoriteView(APIView):
         init_data = availability_init_data(request)
         try:
             # Получаем пользователя
-            player = await Player.objects.aget(tg_id=init_data["id"])
+            player = await async_db.aget(Player.objects, tg_id=init_data["id"])
             tg_id = request.data.get("tg_id")
             if not tg_id:
                 return Response({"error": "Укажите tg_id"}, status=status.HTTP_400_BAD_REQUEST)
@@ -1004,6 +1013,84 @@ class FavoriteView(APIView):
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
+@favorite_page_schema
+class FavoritePageView(APIView):
+    """Избранное постранично: курсор по (created_at, id), индекс (owner, created_at)"""
+    async def get(self, request):
+        # Проверяем авторизацию через Telegram
+        init_data = availability_init_data(request)
+        page_size = parse_page_size(request.query_params.get("limit"))
+        try:
+            player_id = await Player.objects.filter(tg_id=init_data["id"]).values_list("id", flat=True).aget()
+            qs = (
+                Favorite.objects.filter(owner_id=player_id)
+                .filter(after_cursor(request.query_params.get("cursor")))
+                .select_related("target", "target__man_profile", "target__woman_profile")
+                .prefetch_related(
+                    Prefetch("target__man_profile__photos", queryset=ManPhoto.objects.only(*PHOTO_FIELDS)),
+                    Prefetch("target__woman_profile__photos", queryset=WomanPhoto.objects.only(*PHOTO_FIELDS)),
+                )
+                .order_by("-created_at", "-id")
+            )
+            # Берём на одну запись больше, чтобы понять, есть ли следующая страница
+            favorites = [fav async for fav in qs[:page_size + 1].aiterator()]
+        except InvalidCursor as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Player.DoesNotExist:
+            return Response({"error": "Пользователь не найден"}, status=status.HTTP_404_NOT_FOUND)
+        favorites, next_cursor = split_page(favorites, page_size)
+        omit_choices = serializer_context(request)["omit_choices"]
+        results = [{
+            "id": fav.id,
+            "created_at": fav.created_at,
+            "target": favorite_player_data(fav.target, omit_choices),
+        } for fav in favorites]
+        return Response({"results": results, "next_cursor": next_cursor, "has_next": next_cursor is not None},
+                        status=status.HTTP_200_OK)
+
+
+@mutual_sympathy_page_schema
+class MutualSympathyPageView(APIView):
+    """Взаимные симпатии постранично: курсор по (created_at, id), индекс Match (player, created_at)"""
+    async def get(self, request):
+        # Проверяем авторизацию через Telegram
+        init_data = availability_init_data(request)
+        page_size = parse_page_size(request.query_params.get("limit"))
+        try:
+            player_id = (await async_db.aget(Player.objects.only("id"), tg_id=init_data["id"])).id
+            qs = matches_with_sympathy(
+                Match.objects.filter(player_id=player_id)
+                .filter(after_cursor(request.query_params.get("cursor")))
+                .order_by("-created_at", "-id")
+            )
+            # Берём на одну запись больше, чтобы понять, есть ли следующая страница
+            matches = await async_db.afetch(qs[:page_size + 1])
+        except InvalidCursor as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Player.DoesNotExist:
+            return Response({"error": "Пользователь не найден"}, status=status.HTTP_404_NOT_FOUND)
+        matches, next_cursor = split_page(matches, page_size)
+        omit_choices = serializer_context(request)["omit_choices"]
+        results = [sympathy_data(match.sympathy, omit_choices) for match in matches]
+        return Response({"results": results, "next_cursor": next_cursor, "has_next": next_cursor is not None},
+                        status=status.HTTP_200_OK)
+
+
+@relations_count_schema
+class RelationsCountView(APIView):
+    """Счётчики избранного и взаимных симпатий без загрузки самих карточек"""
+    async def get(self, request):
+        # Проверяем авторизацию через Telegram
+        init_data = availability_init_data(request)
+        try:
+            player_id = await Player.objects.filter(tg_id=init_data["id"]).values_list("id", flat=True).aget()
+        except Player.DoesNotExist:
+            return Response({"error": "Пользователь не найден"}, status=status.HTTP_404_NOT_FOUND)
+        favorites = await Favorite.objects.filter(owner_id=player_id).acount()
+        mutual = await Match.objects.filter(player_id=player_id).acount()
+        return Response({"favorites": favorites, "mutual": mutual}, status=status.HTTP_200_OK)
+
+
 @profile_detail_schema
 class ProfileDetailView(APIView):
     """
@@ -1015,7 +1102,7 @@ class ProfileDetailView(APIView):
         init_data = availability_init_data(request)
         try:
             # Получаем пользователя
-            current_player = await Player.objects.aget(tg_id=init_data["id"])
+            current_player = await async_db.aget(Player.objects, tg_id=init_data["id"])
         except Player.DoesNotExist:
             return Response({"error": "Игрок не найден"}, status=status.HTTP_404_NOT_FOUND)
         # Получаем пользователя для просмотра профиля
@@ -1036,7 +1123,7 @@ class ProfileDetailView(APIView):
                                  .prefetch_related("photos")).aget(player=target)
             except ProfileMan.DoesNotExist:
                 return Response({"error": "Анкета не найдена"}, status=status.HTTP_404_NOT_FOUND)
-            serializer = FullProfileManSerializer(profile, context={"request": request})
+            serializer = FullProfileManSerializer(profile, context=serializer_context(request, request=request))
         else:
             try:
                 # профиль женщины + подтянутые фото (без реакций)
@@ -1044,7 +1131,7 @@ class ProfileDetailView(APIView):
                                  .prefetch_related("photos")).aget(player=target)
             except ProfileWoman.DoesNotExist:
                 return Response({"error": "Анкета не найдена"}, status=status.HTTP_404_NOT_FOUND)
-            serializer = FullProfileWomanSerializer(profile, context={"request": request})
+            serializer = FullProfileWomanSerializer(profile, context=serializer_context(request, request=request))
 
         # Флаги
         is_favorite = await Favorite.objects.filter(owner=current_player, target=target).aexists()
@@ -1070,7 +1157,7 @@ class EventPlayerView(APIView):
         init_data = availability_init_data(request)
         try:
             # Получаем пользователя
-            player = await Player.objects.aget(tg_id=init_data["id"])
+            player = await async_db.aget(Player.objects, tg_id=init_data["id"])
         except Player.DoesNotExist:
             return Response({"error": "Игрок не найден"}, status=status.HTTP_404_NOT_FOUND)
         try:
@@ -1099,7 +1186,7 @@ class EventPlayerView(APIView):
         # Проверяем авторизацию через Telegram
         init_data = availability_init_data(request)
         try:
-            player = await Player.objects.aget(tg_id=init_data["id"])
+            player = await async_db.aget(Player.objects, tg_id=init_data["id"])
             serializer = EventSerializer(data=request.data)
             if serializer.is_valid():
                 # Сохраняем с создателем
@@ -1116,7 +1203,7 @@ class EventPlayerView(APIView):
         # Проверяем авторизацию через Telegram
         init_data = availability_init_data(request)
         try:
-            player = await Player.objects.aget(tg_id=init_data["id"])
+            player = await async_db.aget(Player.objects, tg_id=init_data["id"])
             event = await Event.objects.aget(id=event_id, profile=player)
             serializer = EventSerializer(event, data=request.data, partial=True)
             if serializer.is_valid():
@@ -1135,7 +1222,7 @@ class EventPlayerView(APIView):
         # Проверяем авторизацию через Telegram
         init_data = availability_init_data(request)
         try:
-            player = await Player.objects.aget(tg_id=init_data["id"])
+            player = await async_db.aget(Player.objects, tg_id=init_data["id"])
             event = await Event.objects.aget(id=event_id, profile=player)
             await event.adelete()
             return Response({"message": "Ивент удален"})
@@ -1155,7 +1242,7 @@ class OppositeGenderEventsView(APIView):
             return Response({"error": "Не авторизован"}, status=status.HTTP_401_UNAUTHORIZED)
         try:
             # Получаем текущего пользователя
-            current_player = await Player.objects.aget(tg_id=init_data["id"])
+            current_player = await async_db.aget(Player.objects, tg_id=init_data["id"])
 
             # Если передан event_id - возвращаем один конкретный ивент
             if event_id:
@@ -1180,10 +1267,11 @@ class OppositeGenderEventsView(APIView):
 
                     # Добавляем профиль создателя
                     profile = event.profile
+                    context = serializer_context(request)
                     if profile.gender == "Woman" and hasattr(profile, 'woman_profile'):
-                        creator_data = FullProfileWomanSerializer(profile.woman_profile).data
+                        creator_data = FullProfileWomanSerializer(profile.woman_profile, context=context).data
                     elif profile.gender == "Man" and hasattr(profile, 'man_profile'):
-                        creator_data = FullProfileManSerializer(profile.man_profile).data
+                        creator_data = FullProfileManSerializer(profile.man_profile, context=context).data
                     else:
                         creator_data = None
 
@@ -1193,65 +1281,7 @@ class OppositeGenderEventsView(APIView):
                 except Event.DoesNotExist:
                     return Response({"error": "Ивент не найден"}, status=status.HTTP_404_NOT_FOUND)
 
-            # Определяем противоположный пол
-            opposite_gender = "Woman" if current_player.gender == "Man" else "Man"
-
-            # Базовый запрос с предзагрузкой всех данных
-            events_query = (Event.objects.select_related(
-                "profile",
-                "profile__woman_profile",
-                "profile__man_profile"
-            ).prefetch_related(
-                "profile__woman_profile__photos",
-                "profile__man_profile__photos"
-            ).filter(
-                is_active=True,
-                profile__gender=opposite_gender
-            ).exclude(profile=current_player))
-
-            # Фильтр по стране (alpha2 из GeoNames), если передан
-            alpha2 = request.GET.get('alpha2')
-            if alpha2 and alpha2.strip():
-                events_query = events_query.filter(alpha2=alpha2.strip().upper())
-
-            # Фильтр по городу (если передан)
-            city = request.GET.get('city')
-            if city and city.strip():
-                try:
-                    city_int = int(city)
-                    events_query = events_query.filter(city=city_int)
-                except ValueError:
-                    pass
-
-            # Фильтр по минимальному возрасту (по умолчанию 18)
-            min_age_filter = request.GET.get('min_age', '18')
-            try:
-                min_age = int(min_age_filter)
-                min_age = max(min_age, 18)
-            except ValueError:
-                min_age = 18
-
-            # Фильтр по максимальному возрасту (по умолчанию 99)
-            max_age_filter = request.GET.get('max_age', '99')
-            try:
-                max_age = int(max_age_filter)
-                max_age = min(max_age, 99)
-            except ValueError:
-                max_age = 99
-
-            # Пересечение возрастных диапазонов: (min_age_event <= max_age_filter) и (max_age_event >= min_age_filter)
-            events_query = events_query.filter(
-                Q(min_age__lte=max_age) & Q(max_age__gte=min_age)
-            )
-
-            # Фильтр по верификации - только если явно запрошены верифицированные
-            verification_filter = request.GET.get('verification')
-            if verification_filter and verification_filter.lower() in ['true', '1', 'yes']:
-                events_query = events_query.filter(profile__verification=True)
-
-            # Показываем только ивенты с датой сегодня и позже или без даты
-            today = timezone.now().date()
-            events_query = events_query.filter(Q(date__isnull=True) | Q(date__gte=today))
+            events_query = opposite_events_queryset(current_player, request.GET)
 
             # Пагинация
             page = int(request.GET.get('page', 1))
@@ -1279,8 +1309,6 @@ class OppositeGenderEventsView(APIView):
             if page > total_pages:
                 page = total_pages
 
-            # Сортировка по дате создания (сначала новые) и пагинация
-            events_query = events_query.order_by('-created_at')
             start = (page - 1) * page_size
             end = start + page_size
 
@@ -1290,6 +1318,7 @@ class OppositeGenderEventsView(APIView):
                 events_list.append(event)
 
             # Сериализуем данные
+            context = serializer_context(request)
             events_data = []
             for event in events_list:
                 event_serializer = EventSerializer(event)
@@ -1298,9 +1327,9 @@ class OppositeGenderEventsView(APIView):
                 # Добавляем профиль создателя
                 profile = event.profile
                 if profile.gender == "Woman" and hasattr(profile, 'woman_profile'):
-                    creator_data = FullProfileWomanSerializer(profile.woman_profile).data
+                    creator_data = FullProfileWomanSerializer(profile.woman_profile, context=context).data
                 elif profile.gender == "Man" and hasattr(profile, 'man_profile'):
-                    creator_data = FullProfileManSerializer(profile.man_profile).data
+                    creator_data = FullProfileManSerializer(profile.man_profile, context=context).data
                 else:
                     creator_data = None
 
@@ -1331,7 +1360,7 @@ class UserLikeView(APIView):
     async def post(self, request):
         init_data = availability_init_data(request)
         try:
-            from_player = await Player.objects.aget(tg_id=init_data["id"])
+            from_player = await async_db.aget(Player.objects, tg_id=init_data["id"])
             to_player_tg_id = request.data.get("to_player_tg_id")
             reaction_type = request.data.get("reaction_type")
 
@@ -1472,7 +1501,7 @@ class UpdateVerificationView(GenericAPIView):
     async def patch(self, request):
         init_data = availability_init_data(request)
         try:
-            player = await Player.objects.aget(tg_id=init_data["id"])
+            player = await async_db.aget(Player.objects, tg_id=init_data["id"])
             player.verification = True  # Устанавливаем флаг в True
             await player.asave()  # Сохраняем изменения
             return Response({"verification": True})
@@ -1488,7 +1517,7 @@ class UpdateShowInGameView(GenericAPIView):
     async def patch(self, request):
         init_data = availability_init_data(request)
         try:
-            player = await Player.objects.aget(tg_id=init_data["id"])
+            player = await async_db.aget(Player.objects, tg_id=init_data["id"])
             serializer = self.get_serializer(player, data=request.data, partial=True)
             if serializer.is_valid():
                 await serializer.asave()
@@ -1510,6 +1539,42 @@ class ProductListView(APIView):
         init_data = availability_init_data(request)
         if not init_data:
             return Response({"error": "telegram_user not found"}, status=400)
-        products = [product async for product in Product.objects.all().order_by('id')]
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data)
+        # Каталог почти не меняется: берём из кэша (память процесса -> Redis -> БД) и отдаём с ETag
+        catalog = await get_product_catalog()
+        return etag_response(request, catalog["data"], etag=catalog["etag"])
+
+
+# Справочники статичны — собираем ответ и его ETag один раз при импорте модуля
+CHOICES_PAYLOAD = {
+    "gender_choices": GENDER_CHOICES_DATA,
+    "language_choices": [[value, label] for value, label in LANGUAGE_CHOICES],
+}
+CHOICES_ETAG = make_etag(CHOICES_PAYLOAD)
+
+
+@choices_schema
+class ChoicesView(APIView):
+    """Справочники для выбора пола и языков"""
+    async def get(self, request):
+        return etag_response(request, CHOICES_PAYLOAD, etag=CHOICES_ETAG, max_age=24 * 60 * 60)
+
+
+async def metrics_view(request):
+    """
+    Метрики процесса в формате Prometheus (внутренний адрес, не для Mini App).
+    Доступ по заголовку Authorization: Bearer <METRICS_TOKEN> или с адреса из METRICS_ALLOWED_IPS,
+    без настроек — 403: адрес за прокси может оказаться «внутренним» для любого клиента.
+    """
+    token = settings.METRICS_TOKEN
+    allowed = bool(token) and hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+    if not allowed and settings.METRICS_ALLOWED_IPS:
+        try:
+            address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+        except ValueError:
+            address = None
+        allowed = address is not None and any(
+            address in ipaddress.ip_network(network, strict=False) for network in settings.METRICS_ALLOWED_IPS
+        )
+    if not allowed:
+        return HttpResponse(status=403)
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,46 +1,153 @@
+"""
+Логирование без блокировок event loop: логгеры кладут записи в очередь (QueueHandler — только put в память),
+а файл и консоль пишет отдельный поток QueueListener. Записи — JSON по строке (удобно грепать и собирать
+в Loki/ELK); LOG_FORMAT=text — прежний человекочитаемый формат.
+
+Уровни: LOG_LEVEL — общий для логгера проекта, LOG_LEVELS="gift_system.auth=DEBUG,django.db.backends=WARNING" —
+по отдельным логгерам. Отладочные записи горячих путей сэмплируются: DEBUG проходит с вероятностью
+LOG_DEBUG_SAMPLE_RATE (или extra={"sample_rate": ...} у конкретного вызова), в JSON пишется доля сэмплирования.
+"""
+import atexit
 import logging
-from logging.handlers import TimedRotatingFileHandler
 import os
-from datetime import datetime
+import queue
+import random
+import traceback
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
 
+import orjson
 
-def setup_logger(name, log_file, level=logging.DEBUG):
-    """Настройка логгера с указанным именем и файлом"""
-    logger = logging.getLogger(name)
-    logger.setLevel(level)
 
-    log_dir = "logs"
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
+LOG_DIR = "logs"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", 0.1))
+TEXT_FORMAT = "[%(asctime)s] [%(levelname)s] [%(name)s] [%(funcName)s:%(lineno)d] - %(message)s"
 
-    log_file_path = os.path.join(log_dir, log_file)
+# Атрибуты, которые есть у любой LogRecord: всё остальное пришло из extra и попадает в JSON отдельными полями
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "sample_rate"}
 
-    handler = TimedRotatingFileHandler(
-        log_file_path,
-        when="midnight",
-        interval=1,
-        backupCount=30,
-        encoding='utf-8'
-    )
 
-    formatter = logging.Formatter(
-        '[%(asctime)s] [%(levelname)s] [%(name)s] [%(funcName)s:%(lineno)d] - %(message)s'
-    )
-    handler.setFormatter(formatter)
+def parse_levels(value: str) -> dict:
+    """"a=DEBUG,b.c=WARNING" -> {"a": "DEBUG", "b.c": "WARNING"}"""
+    levels = {}
+    for part in (value or "").split(","):
+        name, _, level = part.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+LOG_LEVELS = parse_levels(os.getenv("LOG_LEVELS"))
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись одной строкой JSON: время, уровень, логгер, место в коде, сообщение, поля extra, трейсбек"""
+
+    def format(self, record):
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "func": f"{record.module}.{record.funcName}:{record.lineno}",
+            "message": record.getMessage(),
+        }
+        if getattr(record, "sample_rate", 1) < 1:
+            data["sample_rate"] = record.sample_rate
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                data[key] = value
+        if record.exc_text:
+            data["exc_info"] = record.exc_text
+        return orjson.dumps(data, default=str).decode()
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускаем долю DEBUG-записей (остальные уровни — всегда)"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        rate = getattr(record, "sample_rate", self.rate)
+        record.sample_rate = rate
+        return rate >= 1 or random.random() < rate
 
-    # Удаляем все старые обработчики (если есть)
-    if logger.hasHandlers():
-        logger.handlers.clear()
 
-    logger.addHandler(handler)
+class AsyncSafeQueueHandler(QueueHandler):
+    """
+    QueueHandler, который не форматирует запись в вызывающем потоке: только подставляет аргументы
+    и превращает исключение в текст (трейсбек держит кадры — в очередь его не отдаём). JSON собирает поток записи.
+    """
 
-    # Добавляем вывод в консоль с тем же форматтером
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = "".join(traceback.format_exception(*record.exc_info)).rstrip()
+            record.exc_info = None
+        record.stack_info = None
+        return record
+
+
+_queue_handler = None
+_listener = None
+
+
+def _output_handlers():
+    os.makedirs(LOG_DIR, exist_ok=True)
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+    file_handler = TimedRotatingFileHandler(
+        os.path.join(LOG_DIR, f"{datetime.now().strftime('%Y-%m-%d')}.log"),
+        when="midnight", interval=1, backupCount=30, encoding="utf-8",
+    )
     console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    for handler in (file_handler, console_handler):
+        handler.setFormatter(formatter)
+    return file_handler, console_handler
+
+
+def _start_listener():
+    global _listener
+    _queue_handler.queue = queue.SimpleQueue()
+    _listener = QueueListener(_queue_handler.queue, *_output_handlers(), respect_handler_level=True)
+    _listener.start()
 
+
+def _restart_after_fork():
+    # Поток записи не переживает fork (воркеры Celery, uvicorn --workers): в дочернем процессе свой поток и очередь
+    if _queue_handler is not None:
+        _start_listener()
+
+
+def get_queue_handler() -> QueueHandler:
+    """Общий для процесса обработчик-очередь: для логгера проекта и для LOGGING в settings (логгеры Django)"""
+    global _queue_handler
+    if _queue_handler is None:
+        _queue_handler = AsyncSafeQueueHandler(queue.SimpleQueue())
+        _queue_handler.addFilter(SamplingFilter(LOG_DEBUG_SAMPLE_RATE))
+        _start_listener()
+        atexit.register(lambda: _listener.stop())
+        os.register_at_fork(after_in_child=_restart_after_fork)
+    return _queue_handler
+
+
+def setup_logger(name: str) -> logging.Logger:
+    """Логгер проекта: пишет только в очередь, уровни — из LOG_LEVEL и LOG_LEVELS"""
+    logger = logging.getLogger(name)
+    logger.setLevel(LOG_LEVEL)
+    logger.handlers.clear()
+    logger.addHandler(get_queue_handler())
+    # Не дублируем записи через корневой логгер (Celery вешает на него свои обработчики)
+    logger.propagate = False
+    for logger_name, level in LOG_LEVELS.items():
+        logging.getLogger(logger_name).setLevel(level)
     return logger
 
 
-# Один логгер для всего (и инфо, и ошибки и пр.)
-logger = setup_logger("gift_system", f"{datetime.now().strftime('%Y-%m-%d')}.log", logging.DEBUG)
+# Один логгер для всего (и инфо, и ошибки и пр.); для отдельных уровней — дочерние: logger.getChild("auth")
+logger = setup_logger("gift_system")
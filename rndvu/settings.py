@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
+import sys
 from pathlib import Path
 import redis
 from celery.schedules import crontab
@@ -20,9 +21,18 @@ from corsheaders.defaults import default_headers, default_methods
 
 load_dotenv()
 
+# После load_dotenv: logger_conf читает LOG_* из окружения при импорте
+from logger_conf import LOG_LEVELS  # noqa: E402
+
 YOOKASSA_SHOP_ID = os.getenv("YOOKASSA_SHOP_ID")
 YOOKASSA_SECRET_KEY = os.getenv("YOOKASSA_SECRET_KEY")
 YOOKASSA_WEBHOOK_URL = os.getenv("YOOKASSA_WEBHOOK_URL")
+# Общий HTTP-клиент ЮKassa (core_rndvu/utils/yookassa_client.py): таймауты в секундах, размер пула и повторы
+YOOKASSA_TIMEOUT = float(os.getenv("YOOKASSA_TIMEOUT", 10))
+YOOKASSA_CONNECT_TIMEOUT = float(os.getenv("YOOKASSA_CONNECT_TIMEOUT", 3))
+YOOKASSA_MAX_CONNECTIONS = int(os.getenv("YOOKASSA_MAX_CONNECTIONS", 20))
+YOOKASSA_MAX_RETRIES = int(os.getenv("YOOKASSA_MAX_RETRIES", 2))
+YOOKASSA_RETRY_BACKOFF = float(os.getenv("YOOKASSA_RETRY_BACKOFF", 0.5))
 
 DEBUG = os.getenv('DEBUG', 'False') == 'True'
 
@@ -69,6 +79,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Время, запросы к БД и рендеринг JSON по ручкам API: первой, чтобы замер включал остальные middleware
+    'core_rndvu.middleware.request_metrics.RequestMetricsMiddleware',
+    # Сжатие ответов: стоит выше остальных, чтобы обработать уже готовое тело ответа
+    'core_rndvu.middleware.compression.CompressionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -77,9 +91,16 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'core_rndvu.middleware.telegram_auth.AsyncTelegramAuthMiddleware'
+    'core_rndvu.middleware.telegram_auth.AsyncTelegramAuthMiddleware',
+    # Выбор БД для чтения (реплика/primary): после авторизации, когда известен игрок
+    'core_rndvu.middleware.db_routing.ReplicaRoutingMiddleware',
 ]
 
+# Сжатие ответов (core_rndvu.middleware.compression): ответы меньше порога не сжимаем
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 5))
+
 ROOT_URLCONF = 'rndvu.urls'
 
 TEMPLATES = [
@@ -120,6 +141,61 @@ DATABASES = {
     }
 }
 
+# Соединения с БД (POSTGRES_POOL_MODE):
+#   pool       — пул psycopg3 внутри процесса: потоки sync_to_async берут готовое соединение, а не открывают новое
+#   persistent — постоянное соединение на поток (CONN_MAX_AGE) с проверкой живости перед запросом
+#   pgbouncer  — за внешним pgbouncer в transaction-режиме: то же, но без серверных курсоров
+# Размер пула считается на процесс: uvicorn + каждый воркер Celery, в сумме меньше max_connections
+DB_POOL_MODE = os.getenv("POSTGRES_POOL_MODE", "pool")
+# Проверка живости соединения перед использованием: в режиме pool — при выдаче из пула (разорванные после
+# рестарта БД или failover заменяются новыми), в остальных — в начале запроса для постоянного соединения
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+if DB_POOL_MODE == "pool":
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": int(os.getenv("POSTGRES_POOL_MIN_SIZE", 2)),
+        "max_size": int(os.getenv("POSTGRES_POOL_MAX_SIZE", 10)),
+        # Сколько секунд запрос ждёт свободное соединение, прежде чем упасть с PoolTimeout
+        "timeout": float(os.getenv("POSTGRES_POOL_TIMEOUT", 10)),
+        "max_idle": float(os.getenv("POSTGRES_POOL_MAX_IDLE", 5 * 60)),
+        "max_lifetime": float(os.getenv("POSTGRES_POOL_MAX_LIFETIME", 30 * 60)),
+    }
+else:
+    DATABASES["default"]["CONN_MAX_AGE"] = int(os.getenv("POSTGRES_CONN_MAX_AGE", 60))
+    DATABASES["default"]["DISABLE_SERVER_SIDE_CURSORS"] = DB_POOL_MODE == "pgbouncer"
+
+# Нативный async-драйвер (psycopg3 AsyncConnection) для горячих чтений — см. core_rndvu/async_db.py.
+# Отдельный пул в event loop uvicorn, в сумме с пулом ORM должен помещаться в max_connections
+ASYNC_DB_ENABLED = os.getenv("ASYNC_DB_ENABLED", "False") == "True"
+ASYNC_DB_POOL_MIN_SIZE = int(os.getenv("ASYNC_DB_POOL_MIN_SIZE", 1))
+ASYNC_DB_POOL_MAX_SIZE = int(os.getenv("ASYNC_DB_POOL_MAX_SIZE", 10))
+ASYNC_DB_POOL_TIMEOUT = float(os.getenv("ASYNC_DB_POOL_TIMEOUT", 10))
+
+# Реплика для чтения (core_rndvu/db_router.py): задаётся POSTGRES_REPLICA_HOST, без неё всё идёт в default.
+# В тестах реплика — зеркало default (та же тестовая БД)
+if os.getenv("POSTGRES_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **deepcopy(DATABASES["default"]),
+        "HOST": os.getenv("POSTGRES_REPLICA_HOST"),
+        "PORT": os.getenv("POSTGRES_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["core_rndvu.db_router.ReplicaRouter"]
+# Сколько секунд после своей записи игрок читает из primary (должно перекрывать отставание реплики)
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", 5))
+
+# Детектор N+1 и медленных запросов в ручках API (dev/staging, по умолчанию включён при DEBUG)
+QUERY_INSPECTOR_ENABLED = os.getenv("QUERY_INSPECTOR_ENABLED", str(DEBUG)) == "True"
+QUERY_INSPECTOR_SLOW_MS = int(os.getenv("QUERY_INSPECTOR_SLOW_MS", 100))
+# Сколько одинаковых по форме запросов за один запрос API считается N+1
+QUERY_INSPECTOR_REPEAT_THRESHOLD = int(os.getenv("QUERY_INSPECTOR_REPEAT_THRESHOLD", 3))
+# Находки — исключение вместо лога: в тестах запрос через тестовый клиент падает (QUERY_INSPECTOR_RAISE=True)
+QUERY_INSPECTOR_RAISE = os.getenv("QUERY_INSPECTOR_RAISE", "False") == "True"
+
+# /internal/metrics/ (Prometheus): по Authorization: Bearer METRICS_TOKEN или с адресов/подсетей из
+# METRICS_ALLOWED_IPS (через запятую, например "10.0.0.5,172.16.0.0/12"). Ни того, ни другого — ручка закрыта
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv("METRICS_ALLOWED_IPS", "").split(",") if ip.strip()]
+
 # DigitalOcean Spaces
 AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
@@ -187,6 +263,10 @@ CACHES = {
         }
     }
 }
+# manage.py test работает с отдельной базой Redis: тесты очищают её в setUp, не трогая кэш, симпатии и
+# просмотренных из REDIS_LOCATION
+if len(sys.argv) > 1 and sys.argv[1] == "test":
+    CACHES["default"]["LOCATION"] = os.getenv("REDIS_TEST_LOCATION", "redis://127.0.0.1:6379/15")
 # Создаем асинхронный экземпляр Redis
 redis_instance = redis.StrictRedis(host=os.getenv("REDIS_HOST", "localhost"), port=os.getenv("REDIS_PORT", 6379), db=0)
 
@@ -200,21 +280,42 @@ CELERY_RESULT_SERIALIZER = "json"
 CELERY_TASK_SERIALIZER = "json"
 CELERY_TIMEZONE = "Europe/Moscow"
 CELERY_BEAT_SCHEDULE = {
-    "subscription_days_daily": {
-        "task": "core_rndvu.tasks.decrement_subscription_days_daily",
-        "schedule": crontab(0, 0),  # Каждый день в 00:00 обновляем поле subscription_days_daily
+    "expire_subscriptions_daily": {
+        "task": "core_rndvu.tasks.expire_subscriptions_daily",
+        "schedule": crontab(0, 0),  # Каждый день в 00:00 выключаем истёкшие подписки
+    },
+    "process_pending_payment_events": {
+        "task": "core_rndvu.tasks.process_pending_payment_events",
+        "schedule": crontab(minute="*/5"),  # Каждые 5 минут досылаем необработанные события ЮKassa
     },
-    "delete_passed_users": {
-        "task": "core_rndvu.tasks.delete_old_passed_users",
-        "schedule": crontab(0, 0),  # Каждый день в 00:00 удаляем старые записи о пропущенных пользователях
+    "cleanup_payment_events": {
+        "task": "core_rndvu.tasks.cleanup_payment_events",
+        "schedule": crontab(30, 3),  # Каждый день в 03:30 удаляем старые применённые события ЮKassa
     },
 }
+# Пакетное удаление в обслуживающих задачах (core_rndvu/maintenance.py)
+MAINTENANCE_BATCH_SIZE = int(os.getenv("MAINTENANCE_BATCH_SIZE", 5000))
+# Бюджет времени на одну задачу, с запасом до CELERY_TASK_TIME_LIMIT
+MAINTENANCE_TIME_BUDGET = int(os.getenv("MAINTENANCE_TIME_BUDGET", 5 * 60))
+MAINTENANCE_BATCH_PAUSE = float(os.getenv("MAINTENANCE_BATCH_PAUSE", 0.05))
+# Сколько дней храним применённые уведомления ЮKassa (PaymentEvent)
+PAYMENT_EVENT_RETENTION_DAYS = int(os.getenv("PAYMENT_EVENT_RETENTION_DAYS", 90))
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # JSON рендерим и парсим через orjson (формат тот же, что у стандартных JSONRenderer/JSONParser)
+    'DEFAULT_RENDERER_CLASSES': [
+        'core_rndvu.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core_rndvu.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 
@@ -230,6 +331,14 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 LOGGING = deepcopy(DEFAULT_LOGGING)
 LOGGING["handlers"]["null"] = {"class": "logging.NullHandler"}
+# Логи Django (ошибки запросов и т.п.) — через ту же очередь, что и логгер проекта (logger_conf), без записи в event loop
+LOGGING["handlers"]["queue"] = {"()": "logger_conf.get_queue_handler"}
+LOGGING["loggers"]["django"]["handlers"] = ["queue", "mail_admins"]
+# Уровни логгеров Django из LOG_LEVELS: dictConfig выставляет их после logger_conf и иначе вернул бы свои.
+# Логгеры проекта сюда не добавляем — dictConfig снял бы с них обработчик-очередь
+for _name, _level in LOG_LEVELS.items():
+    if _name.split(".")[0] == "django":
+        LOGGING["loggers"].setdefault(_name, {})["level"] = _level
 # Скрываем шумные DisallowedHost от сканеров без заголовка Host
 LOGGING["loggers"]["django.security.DisallowedHost"] = {
     "handlers": ["null"],
@@ -19,6 +19,8 @@ from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
+from core_rndvu.views import metrics_view
+
 from rndvu import settings
 
 urlpatterns = [
@@ -26,6 +28,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('rndvu/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('rndvu/schema/swagger-ui/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
+    path('internal/metrics/', metrics_view, name='metrics'),
 ]
 
 